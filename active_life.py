@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from typing import List
+Life = np.ndarray
+
+
+
+class ActiveLife:
+    '''
+    Represents a GoL pattern that only re-evaluates tiles close to changed cells
+
+    The board is cut into tile x tile squares. A cell can only change if one of its
+    neighbours (or itself) changed in the last generation, so only tiles next to a
+    dirty tile (a tile with a changed cell) are stepped, everything else is copied.
+    '''
+
+
+    def __init__(self, life: Life, geometry: str = 'Hard Edges', tile: int = 16) -> None:
+        if geometry not in ('Hard Edges', 'Torus'):
+            raise Exception(f"No such geometry '{geometry}' is supported.")
+
+        self.life = life.astype(np.int8)
+        self.geometry = geometry
+        self.tile = tile
+        self.active_counts: List[int] = []
+
+        height, width = life.shape
+        self.tiles_shape = (-(-height // tile), -(-width // tile))
+        # at the start everything counts as changed
+        self.dirty = np.ones(self.tiles_shape, dtype=bool)
+        # amount of board cells inside each tile (tiles on the bottom/right rim can be cut off)
+        self.tile_cells = np.outer(
+            np.minimum(tile, height - tile * np.arange(self.tiles_shape[0])),
+            np.minimum(tile, width - tile * np.arange(self.tiles_shape[1]))
+        )
+        # (tile rows, tile cols, tile, tile) mask of the cells that lie on the board
+        inside = np.zeros((self.tiles_shape[0] * tile, self.tiles_shape[1] * tile), dtype=np.int8)
+        inside[:height, :width] = 1
+        self.inside = inside.reshape(self.tiles_shape[0], tile, self.tiles_shape[1], tile).swapaxes(1, 2)
+
+
+    def active_tiles(self) -> np.ndarray:
+        '''dirty tiles grown by their 8 neighbour tiles'''
+
+        if self.geometry == 'Torus':
+            grown = np.pad(self.dirty, 1, mode='wrap')
+        else:
+            grown = np.pad(self.dirty, 1)
+        rows, cols = self.tiles_shape
+        active = np.zeros(self.tiles_shape, dtype=bool)
+        for dr in range(3):
+            for dc in range(3):
+                active |= grown[dr : dr+rows, dc : dc+cols]
+        return active
+
+
+    def next_gen(self) -> int:
+        '''compute the next generation in place and return the amount of re-evaluated cells'''
+
+        t = self.tile
+        height, width = self.life.shape
+        rows, cols = self.tiles_shape
+        active = self.active_tiles()
+
+        # board with a 1 cell halo, extended to whole tiles
+        if self.geometry == 'Torus':
+            padded = np.pad(self.life, 1, mode='wrap')
+        else:
+            padded = np.pad(self.life, 1)
+        padded = np.pad(padded, ((0, rows * t - height), (0, cols * t - width)))
+
+        # (n, t+2, t+2) stack of the active tiles with their halo
+        windows = sliding_window_view(padded, (t + 2, t + 2))[::t, ::t][active]
+        near = np.zeros((windows.shape[0], t, t), dtype=np.int8)
+        for dr in range(3):
+            for dc in range(3):
+                if dr != 1 or dc != 1:
+                    near += windows[:, dr : dr+t, dc : dc+t]
+        old = windows[:, 1:-1, 1:-1]
+        new = ((near == 3) | ((near == 2) & (old != 0))).astype(np.int8)
+        # cells of the extension beyond the board stay dead
+        new &= self.inside[active]
+
+        extended = padded[1 : rows*t + 1, 1 : cols*t + 1].copy()
+        extended.reshape(rows, t, cols, t).swapaxes(1, 2)[active] = new
+
+        self.life = extended[:height, :width].copy()
+        self.dirty = np.zeros(self.tiles_shape, dtype=bool)
+        self.dirty[active] = (new != old).any(axis=(1, 2))
+
+        count = int(self.tile_cells[active].sum())
+        self.active_counts.append(count)
+        return count
+
+
+    def run_gens(self, gens: int) -> Life:
+        '''compute a future generation'''
+
+        for _ in range(gens):
+            self.next_gen()
+        return self.life
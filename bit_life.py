@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import numpy as np
+
+from typing import Tuple
+Life = np.ndarray
+
+
+
+def _full_adder(a: np.ndarray, b: np.ndarray, c: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    '''bitwise a + b + c for every bit position => (sum bit, carry bit)'''
+
+    ab = a ^ b
+    return ab ^ c, (a & b) | (c & ab)
+
+
+
+class BitLife:
+    '''Represents a GoL pattern with 64 cells packed into every uint64 word'''
+
+
+    def __init__(self, words: np.ndarray, shape: Tuple[int, int]) -> None:
+        '''
+        words = (rows, ceil(cols / 64)) array of np.uint64
+        bit b of words[r, w] is the cell life[r, 64*w + b], unused high bits are kept 0
+        '''
+
+        self.words = words
+        self.shape = shape
+        self.mask = np.full(words.shape[1], ~np.uint64(0), dtype=np.uint64)
+        if shape[1] % 64:
+            self.mask[-1] = np.uint64((1 << (shape[1] % 64)) - 1)
+
+
+    @staticmethod
+    def from_life(life: Life) -> BitLife:
+        '''pack a dense 0/1 pattern'''
+
+        rows, cols = life.shape
+        n_words = (cols + 63) // 64
+        packed = np.packbits(life.astype(bool), axis=1, bitorder='little')
+        padded = np.zeros((rows, n_words * 8), dtype=np.uint8)
+        padded[:, :packed.shape[1]] = packed
+        return BitLife(padded.view('<u8').astype(np.uint64), (rows, cols))
+
+
+    def to_life(self) -> Life:
+        '''unpack into a dense np.int8 pattern'''
+
+        as_bytes = self.words.astype('<u8').view(np.uint8)
+        bits = np.unpackbits(as_bytes, axis=1, bitorder='little')
+        return bits[:, :self.shape[1]].astype(np.int8)
+
+
+    @property
+    def population(self) -> int:
+        return int(np.unpackbits(self.words.view(np.uint8)).sum())
+
+
+    def next_gen(self, geometry: str = 'Hard Edges') -> BitLife:
+        '''
+        compute the GoL successor function with a certain geometry (see gol_tools.next_gen)
+
+        every word is stepped with bit-sliced adders: first the sum of each horizontal
+        triple (west, centre, east) as 2 bit planes, then the three triples above, on and
+        below each row are added to the 4 bit count of the 3x3 block (centre included),
+        which is 3 for a birth or survival and 4 for a survival
+        '''
+
+        if geometry not in ('Hard Edges', 'Torus'):
+            raise Exception(f"No such geometry '{geometry}' is supported.")
+        words = self.words
+        rows, cols = self.shape
+        one, top = np.uint64(1), np.uint64(63)
+
+        west = words << one
+        west[:, 1:] |= words[:, :-1] >> top
+        east = words >> one
+        east[:, :-1] |= words[:, 1:] << top
+        if geometry == 'Torus':
+            last, bit = (cols - 1) // 64, np.uint64((cols - 1) % 64)
+            west[:, 0] |= (words[:, last] >> bit) & one
+            east[:, last] |= (words[:, 0] & one) << bit
+
+        t0, t1 = _full_adder(west, words, east)
+
+        if geometry == 'Torus':
+            u0, u1 = np.roll(t0, 1, axis=0), np.roll(t1, 1, axis=0)
+            d0, d1 = np.roll(t0, -1, axis=0), np.roll(t1, -1, axis=0)
+        else:
+            u0, u1, d0, d1 = (np.zeros_like(words) for _ in range(4))
+            u0[1:], u1[1:] = t0[:-1], t1[:-1]
+            d0[:-1], d1[:-1] = t0[1:], t1[1:]
+
+        b0, carry = _full_adder(u0, t0, d0)
+        twos, fours = _full_adder(u1, t1, d1)
+        b1, carry = twos ^ carry, twos & carry
+        b2, b3 = fours ^ carry, fours & carry
+
+        new = ~b3 & ((b0 & b1 & ~b2) | (words & ~b0 & ~b1 & b2))
+        return BitLife(new & self.mask, self.shape)
+
+
+    def run_gens(self, gens: int, geometry: str = 'Hard Edges') -> BitLife:
+        '''compute a future generation'''
+
+        life = self
+        for _ in range(gens):
+            life = life.next_gen(geometry)
+        return life
@@ -1,10 +1,17 @@
+from __future__ import annotations
+
 import numpy as np
 from random import random
-from math import inf
+from functools import lru_cache
+
+from bit_life import BitLife
+from active_life import ActiveLife
+from infinite_life import InfiniteLife
+import hashlife
 
 from typing import (
     List, Tuple, Dict,
-    Iterable, Callable,
+    Iterable, Iterator, Callable,
     Optional, Any
 )
 Life = np.ndarray
@@ -22,15 +29,9 @@ def create_rnd(size: Tuple[int, int], density: float = 0.5) -> Life:
 
 
 def pad(life: Life) -> Life:
-    '''surround a pattern with a 1 thick layer of dead cells'''
+    '''surround a pattern (or the last two axes of a stack of patterns) with a 1 thick layer of dead cells'''
 
-    zrow = np.zeros(life.shape[1] + 2, dtype=np.int8)
-    zcol = np.zeros(life.shape[0], dtype=np.int8)
-    return np.vstack((
-        zrow.copy(),
-        np.column_stack((zcol.copy(), life, zcol.copy())),
-        zrow.copy()
-    ))
+    return np.pad(life, [(0, 0)] * (life.ndim - 2) + [(1, 1), (1, 1)])
 
 
 
@@ -58,29 +59,25 @@ def next_gen(oldL: Life, geometry: str = 'Hard Edges') -> Life:
 
     geometry == 'Hard Edges':   cells on the rim have fewer neighboors
     geometry == 'Torus':        grid wraps around on the edges
+
+    the neighbour counts are sums of the 8 shifted views of the padded pattern,
+    so a stack of patterns (shape (..., rows, cols)) is stepped in one go
     '''
 
-    newL = np.zeros(oldL.shape, dtype=np.int8)
     if geometry == 'Hard Edges':
-        oldL = pad(oldL)
+        padded = pad(oldL)
     elif geometry == 'Torus':
-        top, bottom = oldL[0, :], oldL[-1, :]
-        tl, tr, bl, br = oldL[0, 0], oldL[0, -1], oldL[-1, 0], oldL[-1, -1]
-        oldL = np.column_stack((oldL[:, -1], oldL, oldL[:, 0]))
-        oldL = np.row_stack((
-            np.hstack((br, bottom, bl)),
-            oldL,
-            np.hstack((tr, top, tl))
-        ))
+        padded = np.pad(oldL, [(0, 0)] * (oldL.ndim - 2) + [(1, 1), (1, 1)], mode='wrap')
     else:
         raise Exception(f"No such geometry '{geometry}' is supported.")
 
-    for r in range(1, oldL.shape[0] - 1):
-        for c in range(1, oldL.shape[1] - 1):
-            near = oldL[r-1 : r+2, c-1 : c+2].sum() - oldL[r, c]
-            if near == 3 or (near == 2 and oldL[r, c]):
-                newL[r-1, c-1] = 1
-    return newL
+    rows, cols = oldL.shape[-2:]
+    near = np.zeros(oldL.shape, dtype=np.int8)
+    for dr in range(3):
+        for dc in range(3):
+            if dr != 1 or dc != 1:
+                near += padded[..., dr : dr+rows, dc : dc+cols]
+    return ((near == 3) | ((near == 2) & (oldL != 0))).astype(np.int8)
 
 
 def shrink(life: Life) -> Life:
@@ -99,70 +96,53 @@ def shrink(life: Life) -> Life:
 
 
 
+# which rims of the 3x3 successor have to be dead for a kind of single cell predecessor,
+# and how (rotations counter clockwise) to get the other kinds with the same amount of dead rims
+SINGLE_CELL_KINDS = {
+    '':     {'': 0},
+    't':    {'t': 0, 'd': 2, 'l': 1, 'r': 3},
+    'tl':   {'tl': 0, 'tr': 3, 'dl': 1, 'dr': 2},
+    'tlr':  {'tlr': 0, 'dlr': 2, 'tdl': 1, 'tdr': 3},
+    'td':   {'td': 0, 'lr': 3},
+    'tdlr': {'tdlr': 0},
+}
+
+
+@lru_cache(maxsize=None)
 def single_cell_predecessors() -> Dict[str, List[Life]]:
-    '''compute all kind of predecessors of a single cell'''
-
-    on,                off                = [], []
-    top_on,            top_off            = [], []
-    top_left_on,       top_left_off       = [], []
-    top_left_right_on, top_left_right_off = [], []
-    top_down_on,       top_down_off       = [], []
-    center_on,         center_off         = [], []
-
-    for i in range(512, 1024):
-
-        pat0 = np.array(list(bin(i)[3:]), dtype=np.int8).reshape(3,3)
-        pat1 = next_gen(pat0)
-
-        if pat1[1, 1]:
-            on.append(pat0)
-            if pat1[0, 0] + pat1[0, 1] + pat1[0, 2] == 0:
-                top_on.append(pat0)
-                if pat1[2, 0] + pat1[2, 1] + pat1[2, 2] == 0:
-                    top_down_on.append(pat0)
-                if pat1[1, 0] + pat1[2, 0] == 0:
-                    top_left_on.append(pat0)
-                    if pat1[1, 2] + pat1[2, 2] == 0:
-                        top_left_right_on.append(pat0)
-                        if pat1[2, 1] == 0:
-                            center_on.append(pat0)
+    '''
+    compute all kind of predecessors of a single cell
 
-        else:
-            off.append(pat0)
-            if pat1[0, 0] + pat1[0, 1] + pat1[0, 2] == 0:
-                top_off.append(pat0)
-                if pat1[2, 0] + pat1[2, 1] + pat1[2, 2] == 0:
-                    top_down_off.append(pat0)
-                if pat1[1, 0] + pat1[2, 0] == 0:
-                    top_left_off.append(pat0)
-                    if pat1[1, 2] + pat1[2, 2] == 0:
-                        top_left_right_off.append(pat0)
-                        if pat1[2, 1] == 0:
-                            center_off.append(pat0)
-
-    return {
-        'on':     on,                             'off':     off,
-
-        'ont':    top_on,                         'offt':    top_off,
-        'ond':    rot_twice(top_on),              'offd':    rot_twice(top_off),
-        'onl':    rot_counter(top_on),            'offl':    rot_counter(top_off),
-        'onr':    rot_clock(top_on),              'offr':    rot_clock(top_off),
-
-        'ontl':   top_left_on,                    'offtl':   top_left_off,
-        'ontr':   rot_clock(top_left_on),         'offtr':   rot_clock(top_left_off),
-        'ondl':   rot_counter(top_left_on),       'offdl':   rot_counter(top_left_off),
-        'ondr':   rot_twice(top_left_on),         'offdr':   rot_twice(top_left_off),
-
-        'ontlr':  top_left_right_on,              'offtlr':  top_left_right_off,
-        'ondlr':  rot_twice(top_left_right_on),   'offdlr':  rot_twice(top_left_right_off),
-        'ontdl':  rot_counter(top_left_right_on), 'offtdl':  rot_counter(top_left_right_off),
-        'ontdr':  rot_clock(top_left_right_on),   'offtdr':  rot_clock(top_left_right_off),
-
-        'ontd':   top_down_on,                    'offtd':   top_down_off,
-        'onlr':   rot_clock(top_down_on),         'offlr':   rot_clock(top_down_off),
-        
-        'ontdlr': center_on,                      'offtdlr': center_off
-    }
+    all 512 3x3 patterns are stepped at once, and only on the first call:
+    the tables are shared between all callers and therefore read only
+    '''
+
+    codes = np.arange(512)
+    pats0 = ((codes[:, None] >> np.arange(8, -1, -1)) & 1).astype(np.int8).reshape(512, 3, 3)
+    pats1 = next_gen(pats0)
+
+    on = pats1[:, 1, 1] == 1
+    dead_rims = {}
+    for kind in SINGLE_CELL_KINDS:
+        # a successor cell on a rim has to be dead, but only if its whole neighbourhood is in the 3x3
+        # (e.g. the top corners of 't' also depend on the columns left and right of it)
+        dead = np.ones(512, dtype=bool)
+        for i in range(3):
+            for j in range(3):
+                sides = ('t' if i == 0 else '') + ('d' if i == 2 else '') + ('l' if j == 0 else '') + ('r' if j == 2 else '')
+                if sides and all(side in kind for side in sides):
+                    dead &= pats1[:, i, j] == 0
+        dead_rims[kind] = dead
+
+    pre = {}
+    for status, alive in (('on', on), ('off', ~on)):
+        for kind, rotations in SINGLE_CELL_KINDS.items():
+            pats = pats0[alive & dead_rims[kind]]
+            for rims, k in rotations.items():
+                rotated = np.rot90(pats, k, axes=(1, 2)).copy()
+                rotated.flags.writeable = False
+                pre[status + rims] = list(rotated)
+    return pre
 
 
 
@@ -185,6 +165,41 @@ def rot_twice(pats: Iterable[Life]) -> List[Life]:
     return list(map(lambda a: np.rot90(a, 2).copy(), pats))
 
 
+# the 8 symmetries of a square (D4), acting on the last 2 axes so stacks of patterns work as well
+SYMMETRIES: Dict[str, Callable[[Life], Life]] = {
+    'identity':       lambda a: a,
+    'flip_row':       lambda a: np.flip(a, -2),
+    'flip_col':       lambda a: np.flip(a, -1),
+    'rot_twice':      lambda a: np.rot90(a, 2, axes=(-2, -1)),
+    'transpose':      lambda a: np.swapaxes(a, -2, -1),
+    'anti_transpose': lambda a: np.swapaxes(np.rot90(a, 2, axes=(-2, -1)), -2, -1),
+    'rot_counter':    lambda a: np.rot90(a, 1, axes=(-2, -1)),
+    'rot_clock':      lambda a: np.rot90(a, 3, axes=(-2, -1)),
+}
+
+# inverse of every symmetry, all but the rotations by 90 degrees are their own inverse
+INVERSES = {name: name for name in SYMMETRIES}
+INVERSES['rot_counter'], INVERSES['rot_clock'] = 'rot_clock', 'rot_counter'
+
+def symmetries(life: Life) -> List[str]:
+    '''names of the symmetries (see SYMMETRIES) that map life onto itself, always starting with 'identity' '''
+
+    return [
+        name for name, sym in SYMMETRIES.items()
+        if sym(life).shape == life.shape and np.array_equal(sym(life), life)
+    ]
+
+
+def canonical(life: Life) -> Life:
+    '''shrink(life) as the first of its mirror images, so all mirror images have the same canonical form'''
+
+    small = shrink(life).astype(np.int8)
+    return min(
+        (np.ascontiguousarray(sym(small)) for sym in SYMMETRIES.values()),
+        key=lambda image: (image.shape, image.tobytes())
+    )
+
+
 def merge_halves_horizontal(le: Life, re: Life) -> Life:
     return np.hstack((le[:, :-1], re[:, 1:]))
 
@@ -208,65 +223,107 @@ def mid(grid: Life) -> Life:
 
 
 
-def filter_least_cells(lifes: Iterable[Life]) -> List[Life]:
-    '''return all lifes that have the least amount of on cells'''
+class LifeStack:
+    '''
+    Patterns stacked into one (n, rows, cols) array, with the population and the bounding box
+    of every pattern computed once, in one vectorized pass
 
-    filtered = []
-    c_min = inf
-    for life in lifes:
-        c = life.sum()
-        if c < c_min:
-            filtered = [life]
-            c_min = c
-        elif c == c_min:
-            filtered.append(life)
-    return filtered
+    patterns of different shapes are padded with dead cells (indexing gives back the original shape).
+    Filtering selects from the stack and the computed values, so filters compose without
+    looking at the patterns again, e.g. LifeStack(lifes).least_cells().smallest_box()
+    '''
 
 
+    def __init__(self, lifes: Iterable[Life]) -> None:
+        lifes = list(lifes)
+        self.shapes = np.array([life.shape for life in lifes], dtype=np.int64).reshape(-1, 2)
+        if len(set(map(tuple, self.shapes))) <= 1:
+            self.stack = np.array(lifes, dtype=np.int8).reshape(len(lifes), *(self.shapes[0] if lifes else (0, 0)))
+        else:
+            self.stack = np.zeros((len(lifes), *self.shapes.max(axis=0)), dtype=np.int8)
+            for i, life in enumerate(lifes):
+                self.stack[i, :life.shape[0], :life.shape[1]] = life
+        self.population = self.stack.sum(axis=(1, 2), dtype=np.int64)
+        self.boxes = np.stack((extents(self.stack.any(axis=2)), extents(self.stack.any(axis=1))), axis=1)
 
-def filter_most_cells(lifes: Iterable[Life]) -> List[Life]:
-    '''return all lifes that have the most amount of on cells'''
 
-    filtered = []
-    c_max = -inf
-    for life in lifes:
-        c = life.sum()
-        if c > c_max:
-            filtered = [life]
-            c_max = c
-        elif c == c_max:
-            filtered.append(life)
-    return filtered
+    def select(self, keep: np.ndarray) -> LifeStack:
+        '''stack of the patterns selected by keep (boolean mask or indices), nothing is recomputed'''
+
+        selected = object.__new__(LifeStack)
+        selected.shapes = self.shapes[keep]
+        selected.stack = self.stack[keep]
+        selected.population = self.population[keep]
+        selected.boxes = self.boxes[keep]
+        return selected
+
+
+    def least_cells(self) -> LifeStack:
+        return self.select(self.population == self.population.min()) if len(self) else self
+
+    def most_cells(self) -> LifeStack:
+        return self.select(self.population == self.population.max()) if len(self) else self
 
+    def smallest_box(self) -> LifeStack:
+        areas = self.boxes.prod(axis=1)
+        return self.select(areas == areas.min()) if len(self) else self
+
+
+    def __len__(self) -> int:
+        return len(self.stack)
+
+
+    def __getitem__(self, i: int) -> Life:
+        rows, cols = self.shapes[i]
+        return self.stack[i, :rows, :cols]
+
+
+    def __iter__(self) -> Iterator[Life]:
+        return (self[i] for i in range(len(self)))
+
+
+
+def extents(alive: np.ndarray) -> np.ndarray:
+    '''length from the first to the last True of every row of alive, 1 for rows without any'''
+
+    if alive.shape[1] == 0:
+        return np.ones(len(alive), dtype=np.int64)
+    first = alive.argmax(axis=1)
+    last = alive.shape[1] - 1 - alive[:, ::-1].argmax(axis=1)
+    return np.where(alive.any(axis=1), last - first + 1, 1)
+
+
+def as_stack(lifes: Iterable[Life]) -> LifeStack:
+    return lifes if isinstance(lifes, LifeStack) else LifeStack(lifes)
+
+
+
+def filter_least_cells(lifes: Iterable[Life]) -> LifeStack:
+    '''return all lifes that have the least amount of on cells'''
+    return as_stack(lifes).least_cells()
+
+
+def filter_most_cells(lifes: Iterable[Life]) -> LifeStack:
+    '''return all lifes that have the most amount of on cells'''
+    return as_stack(lifes).most_cells()
 
 
 def bounding_box(life: Life) -> Tuple[int, int]:
     '''return the size of the bounding box (rows x cols)'''
-
-    h, w = life.shape
-    r0, c0 = 0, 0 
-    r1, c1 = h - 1, w - 1
-    while r0 < h - 1 and life[r0, :].sum() == 0: r0 += 1
-    while r1 > 0     and life[r1, :].sum() == 0: r1 -= 1
-    while c0 < w - 1 and life[:, c0].sum() == 0: c0 += 1
-    while c1 > 0     and life[:, c1].sum() == 0: c1 -= 1
-    return max(1, r1 - r0 + 1), max(1, c1 - c0 + 1)
+    return int(extents(life.any(axis=1)[None])[0]), int(extents(life.any(axis=0)[None])[0])
 
 
-def filter_bounding_box(lifes: Iterable[Life]) -> List[Life]:
+def filter_bounding_box(lifes: Iterable[Life]) -> LifeStack:
     '''return all lifes with the smallest bounding box'''
+    return as_stack(lifes).smallest_box()
+
 
-    filtered = []
-    bb_min = inf
-    for life in lifes:
-        r, c = bounding_box(life)
-        bb = r * c
-        if bb < bb_min:
-            filtered = [life]
-            bb_min = bb
-        elif bb == bb_min:
-            filtered.append(life)
-    return filtered
+
+FILTERS: Dict[str, Callable[[Iterable[Life]], LifeStack]] = {
+    'Fewest Alive Cells':    filter_least_cells,
+    'Most Alive Cells':      filter_most_cells,
+    'Smallest Bounding Box': filter_bounding_box,
+}
 
 
 
@@ -296,12 +353,74 @@ def test_if_pre(preds: List[Life], goal: Life) -> int:
 
 
 
-def run_gens(life: Life, gens: int, geometry='Hard Edges', print_final: bool = False, print_all: bool = False) -> Life:
-    '''compute a future generation'''
+def run_gens(
+    life: Life, gens: int,
+    geometry: str = 'Hard Edges',
+    print_final: bool = False, print_all: bool = False,
+    engine: str = 'Dense',
+    active_counts: Optional[List[int]] = None,
+    origins: Optional[List[Tuple[int, int]]] = None,
+    max_side: Optional[int] = None
+) -> Life:
+    '''
+    compute a future generation
+
+    geometry == 'Unbounded':  the pattern lives on the infinite plane (as InfiniteLife, or HashLife leaps
+                              for engine == 'HashLife'), the result is the bounding box of the live cells,
+                              the plane coordinates of its top left cell (life[0, 0] is at (0, 0)) are
+                              appended to origins. One of more than max_side cells on a side raises an Exception
+    otherwise:
+    engine == 'Dense':        step the np.int8 array with next_gen
+    engine == 'Bit-Packed':   step a BitLife (64 cells per word) and unpack the result
+    engine == 'HashLife':     leap 2^j generations per set bit of gens with the shared HashLife engine,
+                              only for geometry == 'Torus' (or 'Unbounded', see above)
+    engine == 'Active':       only re-evaluate tiles next to changed cells (see ActiveLife),
+                              the amount of re-evaluated cells per generation is appended to active_counts
+    '''
 
-    for _ in range(gens):
-        if print_all: print_life(life)
-        life = next_gen(life, geometry=geometry)
+    if geometry == 'Unbounded':
+        if engine == 'HashLife' and not print_all:
+            life, origin = hashlife.engine.run_plane(life, gens, max_side=max_side)
+        else:
+            board = InfiniteLife.from_life(life)
+            for _ in range(gens):
+                if print_all: print_life(board.to_life()[0])
+                board = board.next_gen()
+            height, width = board.bounding_box()
+            if max_side is not None and max(height, width) > max_side:
+                raise Exception(f'The pattern grew to {height}x{width} cells, more than {max_side} on a side.')
+            life, origin = board.to_life()
+        if origins is not None:
+            origins.append(origin)
+    elif engine == 'Dense':
+        for _ in range(gens):
+            if print_all: print_life(life)
+            life = next_gen(life, geometry=geometry)
+    elif engine == 'Bit-Packed':
+        bits = BitLife.from_life(life)
+        for _ in range(gens):
+            if print_all: print_life(bits.to_life())
+            bits = bits.next_gen(geometry=geometry)
+        life = bits.to_life()
+    elif engine == 'HashLife':
+        if geometry != 'Torus':
+            raise Exception(f"The HashLife engine does not support the geometry '{geometry}'.")
+        if print_all:
+            for _ in range(gens):
+                print_life(life)
+                life = hashlife.engine.run_torus(life, 1)
+        else:
+            life = hashlife.engine.run_torus(life, gens)
+    elif engine == 'Active':
+        active = ActiveLife(life, geometry=geometry)
+        for _ in range(gens):
+            if print_all: print_life(active.life)
+            active.next_gen()
+        life = active.life
+        if active_counts is not None:
+            active_counts.extend(active.active_counts)
+    else:
+        raise Exception(f"No such engine '{engine}' is supported.")
     if print_final: print_life(life)
     return life
 
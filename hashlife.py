@@ -0,0 +1,282 @@
+from __future__ import annotations
+
+import numpy as np
+
+from typing import Dict, Tuple, Optional
+Life = np.ndarray
+
+
+
+class Node:
+    '''
+    Represents a 2^level by 2^level macrocell
+
+    level 0 nodes are single cells, every other node has 4 children of level - 1:
+        tl tr
+        dl dr
+    '''
+
+    __slots__ = ('level', 'tl', 'tr', 'dl', 'dr', 'population', 'results')
+
+
+    def __init__(
+        self, level: int, population: int,
+        tl: Optional[Node] = None, tr: Optional[Node] = None,
+        dl: Optional[Node] = None, dr: Optional[Node] = None
+    ) -> None:
+
+        self.level = level
+        self.population = population
+        self.tl, self.tr, self.dl, self.dr = tl, tr, dl, dr
+        self.results: Dict[int, Node] = {}
+
+
+
+class HashLife:
+    '''
+    HashLife engine: a canonicalized quadtree of macrocells with memoized successors
+
+    Every distinct (tl, tr, dl, dr) combination exists exactly once in the node table,
+    so the centre of a 2^k node after 2^j generations (j <= k - 2) is computed only once
+    per distinct node. When the table grows beyond max_nodes it is flushed:
+    nodes still in use stay valid, they just stop being shared with newly built ones.
+    '''
+
+
+    def __init__(self, max_nodes: int = 2 ** 20) -> None:
+        self.max_nodes = max_nodes
+        self.nodes: Dict[Tuple[Node, Node, Node, Node], Node] = {}
+        self.off = Node(0, 0)
+        self.on = Node(0, 1)
+        self.empties = [self.off]
+
+
+    def join(self, tl: Node, tr: Node, dl: Node, dr: Node) -> Node:
+        '''return the canonical node with the given children'''
+
+        key = (tl, tr, dl, dr)
+        node = self.nodes.get(key)
+        if node is None:
+            if len(self.nodes) >= self.max_nodes:
+                self.nodes.clear()
+            node = Node(
+                tl.level + 1, tl.population + tr.population + dl.population + dr.population,
+                tl, tr, dl, dr
+            )
+            self.nodes[key] = node
+        return node
+
+
+    def empty(self, level: int) -> Node:
+        '''return a dead 2^level by 2^level node'''
+
+        while len(self.empties) <= level:
+            e = self.empties[-1]
+            self.empties.append(self.join(e, e, e, e))
+        return self.empties[level]
+
+
+    def centre(self, node: Node) -> Node:
+        '''the 2^(level-1) square in the middle of node, without advancing it'''
+
+        return self.join(node.tl.dr, node.tr.dl, node.dl.tr, node.dr.tl)
+
+
+    def expand(self, node: Node) -> Node:
+        '''surround node with a dead ring, such that it becomes the centre of a node one level higher'''
+
+        e = self.empty(node.level - 1)
+        return self.join(
+            self.join(e, e, e, node.tl), self.join(e, e, node.tr, e),
+            self.join(e, node.dl, e, e), self.join(node.dr, e, e, e)
+        )
+
+
+    def from_life(self, life: Life, level: int, row: int = 0, col: int = 0) -> Node:
+        '''node of the given level whose top left cell is life[row, col], outside of life is dead'''
+
+        height, width = life.shape
+        size = 2 ** level
+        if row >= height or col >= width or row + size <= 0 or col + size <= 0:
+            return self.empty(level)
+        if level == 0:
+            return self.on if life[row, col] else self.off
+        half = size // 2
+        return self.join(
+            self.from_life(life, level - 1, row, col),        self.from_life(life, level - 1, row, col + half),
+            self.from_life(life, level - 1, row + half, col), self.from_life(life, level - 1, row + half, col + half)
+        )
+
+
+    def from_torus(self, life: Life, level: int, row: int, col: int, memo: Dict) -> Node:
+        '''like from_life, but on the plane tiled periodically with life'''
+
+        height, width = life.shape
+        key = (level, row % height, col % width)
+        if key in memo:
+            return memo[key]
+        if level == 0:
+            node = self.on if life[key[1:]] else self.off
+        else:
+            half = 2 ** (level - 1)
+            node = self.join(
+                self.from_torus(life, level - 1, row, col, memo),
+                self.from_torus(life, level - 1, row, col + half, memo),
+                self.from_torus(life, level - 1, row + half, col, memo),
+                self.from_torus(life, level - 1, row + half, col + half, memo)
+            )
+        memo[key] = node
+        return node
+
+
+    def cells(self, node: Node, shape: Optional[Tuple[int, int]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        '''(rows, cols) of all live cells of node, restricted to the top left shape if given'''
+
+        height, width = shape if shape is not None else (2 ** node.level,) * 2
+        rows, cols = [], []
+
+        def collect(n: Node, row: int, col: int) -> None:
+            if n.population == 0 or row >= height or col >= width:
+                return
+            if n.level == 0:
+                rows.append(row)
+                cols.append(col)
+                return
+            half = 2 ** (n.level - 1)
+            collect(n.tl, row, col)
+            collect(n.tr, row, col + half)
+            collect(n.dl, row + half, col)
+            collect(n.dr, row + half, col + half)
+
+        collect(node, 0, 0)
+        return np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64)
+
+
+    def to_life(self, node: Node, shape: Optional[Tuple[int, int]] = None) -> Life:
+        '''dense np.int8 pattern of a node, or of its top left shape'''
+
+        if shape is None:
+            shape = (2 ** node.level,) * 2
+        life = np.zeros(shape, dtype=np.int8)
+        life[self.cells(node, shape)] = 1
+        return life
+
+
+    def successor(self, node: Node, j: int) -> Node:
+        '''centre of node (level - 1) after 2^j generations, with 0 <= j <= level - 2'''
+
+        if j in node.results:
+            return node.results[j]
+
+        k = node.level
+        if node.population == 0:
+            result = self.empty(k - 1)
+        elif k == 2:
+            cells = self.to_life(node)
+            near = sum(
+                cells[dr : dr+2, dc : dc+2]
+                for dr in range(3) for dc in range(3) if dr != 1 or dc != 1
+            )
+            alive = cells[1:3, 1:3]
+            new = (near == 3) | ((near == 2) & (alive == 1))
+            result = self.join(*(self.on if c else self.off for c in new.flat))
+        else:
+            tl, tr, dl, dr = node.tl, node.tr, node.dl, node.dr
+            nine = (
+                (tl,                                       self.join(tl.tr, tr.tl, tl.dr, tr.dl), tr),
+                (self.join(tl.dl, tl.dr, dl.tl, dl.tr),    self.centre(node),                     self.join(tr.dl, tr.dr, dr.tl, dr.tr)),
+                (dl,                                       self.join(dl.tr, dr.tl, dl.dr, dr.dl), dr)
+            )
+            # full speed leap: both halves advance 2^(k-3) generations
+            if j == k - 2:
+                first = [[self.successor(n, k - 3) for n in row] for row in nine]
+                second_j = k - 3
+            else:
+                first = [[self.centre(n) for n in row] for row in nine]
+                second_j = j
+            second = [
+                self.successor(self.join(first[r][c], first[r][c+1], first[r+1][c], first[r+1][c+1]), second_j)
+                for r in range(2) for c in range(2)
+            ]
+            result = self.join(*second)
+
+        node.results[j] = result
+        return result
+
+
+    def leap_torus(self, life: Life, j: int) -> Life:
+        '''
+        advance a pattern with 'Torus' geometry by 2^j generations
+
+        the torus is the plane tiled with life, so the root node is built over that tiling
+        with its centre starting at life[0, 0]; the tiling makes most nodes repeat
+        '''
+
+        height, width = life.shape
+        level = max(j + 2, 1 + (len(bin(max(height, width) - 1)) - 2), 2)
+        shift = -(2 ** (level - 2))
+        root = self.from_torus(life, level, shift, shift, {})
+        return self.to_life(self.successor(root, j), (height, width))
+
+
+    def leap_plane(
+        self, life: Life, j: int, origin: Tuple[int, int] = (0, 0), max_side: Optional[int] = None
+    ) -> Tuple[Life, Tuple[int, int]]:
+        '''
+        advance a pattern on the unbounded plane by 2^j generations
+
+        returns the shrunk result and the plane coordinates of its top left cell,
+        origin are the plane coordinates of life[0, 0]. A result of more than max_side cells on a side raises an Exception
+        '''
+
+        level = max(2, len(bin(max(life.shape) - 1)) - 2)
+        root = self.from_life(life, level)
+        row, col = origin
+        # the pattern has to sit in the centre of the centre, so it can't escape the result
+        while root.level < j + 3 or self.centre(self.centre(root)).population != root.population:
+            shift = 2 ** (root.level - 1)
+            root = self.expand(root)
+            row, col = row - shift, col - shift
+        rows, cols = self.cells(self.successor(root, j))
+        shift = 2 ** (root.level - 2)
+        row, col = row + shift, col + shift
+        if rows.size == 0:
+            return np.zeros((1, 1), dtype=np.int8), (row, col)
+        r0, c0 = rows.min(), cols.min()
+        height, width = int(rows.max() - r0 + 1), int(cols.max() - c0 + 1)
+        if max_side is not None and max(height, width) > max_side:
+            raise Exception(f'The pattern grew to {height}x{width} cells, more than {max_side} on a side.')
+        life = np.zeros((rows.max() - r0 + 1, cols.max() - c0 + 1), dtype=np.int8)
+        life[rows - r0, cols - c0] = 1
+        return life, (row + int(r0), col + int(c0))
+
+
+    def run_torus(self, life: Life, gens: int) -> Life:
+        '''advance a torus pattern by gens generations, one 2^j leap per set bit of gens'''
+
+        j = 0
+        while gens:
+            if gens & 1:
+                life = self.leap_torus(life, j)
+            gens >>= 1
+            j += 1
+        return life
+
+
+    def run_plane(
+        self, life: Life, gens: int, origin: Tuple[int, int] = (0, 0), max_side: Optional[int] = None
+    ) -> Tuple[Life, Tuple[int, int]]:
+        '''advance a pattern on the unbounded plane by gens generations (see leap_plane)'''
+
+        j = 0
+        while gens:
+            if gens & 1:
+                life, origin = self.leap_plane(life, j, origin, max_side)
+            gens >>= 1
+            j += 1
+        return life, origin
+
+
+
+# shared engine, so the node table and memoized results survive between calls
+engine = HashLife()
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import numpy as np
+
+from typing import Tuple, Optional
+Life = np.ndarray
+
+
+# (row, col) is stored as one int64 key: (row + OFFSET) << 32 | (col + OFFSET),
+# which covers -OFFSET <= row, col < OFFSET
+OFFSET = 2 ** 30
+NEIGHBOURS = np.array(
+    [(dr << 32) + dc for dr in (-1, 0, 1) for dc in (-1, 0, 1) if dr or dc],
+    dtype=np.int64
+)
+
+
+
+class InfiniteLife:
+    '''Represents a GoL pattern on the unbounded plane as the sorted set of its live cells'''
+
+
+    def __init__(self, keys: np.ndarray) -> None:
+        '''keys = sorted unique np.int64 keys of the live cells (see OFFSET)'''
+
+        self.keys = keys
+
+
+    @staticmethod
+    def from_coords(coords: np.ndarray) -> InfiniteLife:
+        '''coords = (n, 2) array of (row, col) of live cells, duplicates are allowed'''
+
+        coords = np.asarray(coords, dtype=np.int64).reshape(-1, 2)
+        return InfiniteLife(np.unique(((coords[:, 0] + OFFSET) << 32) | (coords[:, 1] + OFFSET)))
+
+
+    @staticmethod
+    def from_life(life: Life, origin: Tuple[int, int] = (0, 0)) -> InfiniteLife:
+        '''origin = plane coordinates of life[0, 0]'''
+
+        return InfiniteLife.from_coords(np.argwhere(life) + np.array(origin, dtype=np.int64))
+
+
+    @property
+    def coords(self) -> np.ndarray:
+        '''(n, 2) array of (row, col) of all live cells'''
+
+        return np.column_stack(((self.keys >> 32) - OFFSET, (self.keys & 0xFFFFFFFF) - OFFSET))
+
+
+    @property
+    def population(self) -> int:
+        return self.keys.size
+
+
+    def extent(self) -> Optional[Tuple[int, int, int, int]]:
+        '''(top, left, bottom, right) of the live cells (inclusive) or None if everything is dead'''
+
+        if self.keys.size == 0:
+            return None
+        coords = self.coords
+        (top, left), (bottom, right) = coords.min(axis=0), coords.max(axis=0)
+        return int(top), int(left), int(bottom), int(right)
+
+
+    def bounding_box(self) -> Tuple[int, int]:
+        '''return the size of the bounding box (rows x cols), like gol_tools.bounding_box'''
+
+        extent = self.extent()
+        if extent is None:
+            return 1, 1
+        top, left, bottom, right = extent
+        return bottom - top + 1, right - left + 1
+
+
+    def to_life(self, frame: Optional[Tuple[int, int, int, int]] = None) -> Tuple[Life, Tuple[int, int]]:
+        '''
+        dense pattern of the bounding box of the live cells (like gol_tools.shrink)
+        and the plane coordinates of its top left cell
+
+        frame = (top, left, bottom, right) (inclusive) area that is always part of the result
+        '''
+
+        extent = self.extent()
+        if extent is None and frame is None:
+            return np.zeros((1, 1), dtype=np.int8), (0, 0)
+        if extent is None:
+            extent = frame
+        elif frame is not None:
+            extent = (
+                min(extent[0], frame[0]), min(extent[1], frame[1]),
+                max(extent[2], frame[2]), max(extent[3], frame[3])
+            )
+        top, left, bottom, right = extent
+        life = np.zeros((bottom - top + 1, right - left + 1), dtype=np.int8)
+        coords = self.coords
+        life[coords[:, 0] - top, coords[:, 1] - left] = 1
+        return life, (top, left)
+
+
+    def next_gen(self) -> InfiniteLife:
+        '''compute the GoL successor function, the pattern grows and shrinks freely'''
+
+        near, counts = np.unique((self.keys[:, None] + NEIGHBOURS).ravel(), return_counts=True)
+        alive = np.isin(near, self.keys, assume_unique=True)
+        return InfiniteLife(near[(counts == 3) | ((counts == 2) & alive)])
+
+
+    def run_gens(self, gens: int) -> InfiniteLife:
+        '''compute a future generation'''
+
+        life = self
+        for _ in range(gens):
+            life = life.next_gen()
+        return life
@@ -2,21 +2,92 @@ import tkinter as tk
 import numpy as np
 
 import gol_tools as gol
+from active_life import ActiveLife
 
 from typing import Tuple, Optional
 Life = np.ndarray
 
 
+# fill of dead and alive cells, as names and as RGB
+COLORS = ('black', 'white')
+PALETTE = np.array([[0, 0, 0], [255, 255, 255]], dtype=np.uint8)
+
+# 'Cells' draws one rectangle per cell, 'Image' the viewport as one image,
+# 'Auto' uses an image for patterns of more than MAX_CELL_ITEMS cells
+RENDER_MODES = ('Auto', 'Cells', 'Image')
+MAX_CELL_ITEMS = 64 * 64
+
+
+
+def view_pixels(life: Life, zoom: float, origin: Tuple[int, int], size: Tuple[int, int]) -> np.ndarray:
+    '''
+    alive mask of the pixels of a viewport, at most size = (height, width) pixels from the cell origin on
+
+    zoom is the amount of pixels per cell, an integer or 1 / integer
+    (then a pixel is alive if any of its cells is)
+    '''
+
+    height, width = size
+    row, col = origin
+    life = np.asarray(life, dtype=np.int8)
+    if zoom >= 1:
+        z = int(zoom)
+        view = life[row : row + -(-height // z), col : col + -(-width // z)]
+        return np.repeat(np.repeat(view, z, axis=0), z, axis=1)[:height, :width]
+    f = round(1 / zoom)
+    view = life[row : row + height * f, col : col + width * f]
+    padded = np.zeros((-(-view.shape[0] // f) * f, -(-view.shape[1] // f) * f), dtype=np.int8)
+    padded[:view.shape[0], :view.shape[1]] = view
+    return padded.reshape(padded.shape[0] // f, f, padded.shape[1] // f, f).max(axis=(1, 3))
+
+
+def ppm(alive: np.ndarray) -> bytes:
+    '''binary PPM image of an alive mask, in the COLORS'''
+
+    height, width = alive.shape
+    return f'P6 {width} {height} 255\n'.encode() + PALETTE[alive.astype(np.int8)].tobytes()
+
+
+def zoomed(zoom: float, steps: int) -> float:
+    '''zoom doubled (or halved for negative steps) steps times, kept an integer or 1 / integer'''
+
+    zoom *= 2.0 ** steps
+    return float(int(zoom)) if zoom >= 1 else 1 / round(1 / zoom)
+
+
 
 class LifeCanvas(tk.Canvas):
-    '''A tk.Canvas that stores and displays a GoL Pattern'''
+    '''
+    A tk.Canvas that stores and displays a GoL Pattern
+
+    every cell keeps its rectangle item (items), a new pattern of the same shape only
+    recolours the cells that differ from the one shown.
+    Large patterns are drawn as one image instead (see RENDER_MODES), of the viewport from the cell
+    origin on with zoom pixels per cell; the right mouse button pans, the wheel zooms.
+    offset are the plane coordinates of life[0, 0] for the 'Unbounded' geometry, where a step
+    returns only the bounding box of the live cells
+    '''
 
-    def __init__(self, life: Optional[Life] = None, **kwargs) -> None:
+    def __init__(self, life: Optional[Life] = None, render: str = 'Auto', **kwargs) -> None:
         super().__init__(**kwargs)
-        if life is not None:
-            self.life = life
         self.max_width  = int(self['width'])
         self.max_height = int(self['height'])
+        self.render = render
+        self.active: Optional[ActiveLife] = None
+        self.items: Optional[np.ndarray] = None
+        self.shown: Optional[Life] = None
+        self.image_item: Optional[int] = None
+        self.photo: Optional[tk.PhotoImage] = None
+        self.zoom = 1.0
+        self.origin = (0, 0)
+        self.offset = (0, 0)
+        self.bind('<ButtonPress-3>', self.on_pan_start)
+        self.bind('<B3-Motion>', self.on_pan)
+        self.bind('<MouseWheel>', lambda event: self.on_zoom(event, 1 if event.delta > 0 else -1))
+        self.bind('<Button-4>', lambda event: self.on_zoom(event, 1))
+        self.bind('<Button-5>', lambda event: self.on_zoom(event, -1))
+        if life is not None:
+            self.life = life
 
     @property
     def rows(self) -> int:
@@ -45,55 +116,178 @@ class LifeCanvas(tk.Canvas):
 
     def on_click(self, event) -> None:
         x, y = self.canvasx(event.x), self.canvasy(event.y)
-        row = int(y // (int(self['height']) / self.rows))
-        col = int(x // (int(self['width']) / self.cols))
+        if self.image_item is not None:
+            row = int(self.origin[0] + y / self.zoom)
+            col = int(self.origin[1] + x / self.zoom)
+            if row >= self.rows or col >= self.cols:
+                return
+        else:
+            row = int(y // (int(self['height']) / self.rows))
+            col = int(x // (int(self['width']) / self.cols))
 
-        new_life = self.life
+        new_life = self.life.copy()
         new_life[row, col] = 1 - new_life[row, col]
         self.life = new_life
 
 
     def update(self, life: Life) -> None:
-        if self.rows > self.cols:
+        '''show life, only the cells that changed are recoloured (all are drawn anew if the shape changed)'''
+
+        if self.render == 'Image' or (self.render == 'Auto' and life.size > MAX_CELL_ITEMS):
+            self.draw_image(life)
+        elif self.items is None or self.items.shape != life.shape:
+            self.rebuild(life)
+        else:
+            changed = np.flatnonzero(life != self.shown)
+            for item, alive in zip(self.items.flat[changed], life.flat[changed]):
+                self.itemconfig(int(item), fill=COLORS[alive])
+        self.shown = np.array(life, dtype=np.int8)
+
+
+    def rebuild(self, life: Life) -> None:
+        '''fit the canvas to the shape of life and create the rectangles of all cells'''
+
+        rows, cols = life.shape
+        if rows > cols:
             self.config(
-                width=round((self.max_height / self.rows) * self.cols),
+                width=round((self.max_height / rows) * cols),
                 height=self.max_height
             )
-        elif self.cols > self.rows:
+        elif cols > rows:
             self.config(
                 width=self.max_width,
-                height=round((self.max_width / self.cols) * self.rows)
+                height=round((self.max_width / cols) * rows)
             )
         else:
             self.config(width=self.max_width, height=self.max_height)
-        cell_width  = int(self['width']) / self.cols
-        cell_height = int(self['height']) / self.rows
+        cell_width  = int(self['width']) / cols
+        cell_height = int(self['height']) / rows
 
         self.delete(tk.ALL)
-        for r in range(self.rows):
-            for c in range(self.cols):
+        self.image_item = None
+        self.photo = None
+        self.items = np.array([
+            [
                 self.create_rectangle(
-                    c * cell_height,     r * cell_width,
-                    (c+1) * cell_height, (r+1) * cell_width,
-                    fill=['black', 'white'][self.life[r, c]],
+                    c * cell_width,     r * cell_height,
+                    (c+1) * cell_width, (r+1) * cell_height,
+                    fill=COLORS[life[r, c]],
                 )
+                for c in range(cols)
+            ]
+            for r in range(rows)
+        ], dtype=np.int64).reshape(rows, cols)
+
+
+    def draw_image(self, life: Life) -> None:
+        '''show the viewport of life as one image, a new shape is shown whole (as far as zoom 1 / integer allows)'''
+
+        if self.image_item is None or self.shown is None or self.shown.shape != life.shape:
+            self.blank()
+            self.config(width=self.max_width, height=self.max_height)
+            fit = min(self.max_width // life.shape[1], self.max_height // life.shape[0])
+            shrink = max(-(-life.shape[0] // self.max_height), -(-life.shape[1] // self.max_width))
+            self.zoom = float(fit) if fit >= 1 else 1 / shrink
+            self.origin = (0, 0)
+            self.image_item = self.create_image(0, 0, anchor=tk.NW)
+        alive = view_pixels(life, self.zoom, self.origin, (self.max_height, self.max_width))
+        self.photo = tk.PhotoImage(master=self, data=ppm(alive), format='PPM')
+        self.itemconfig(self.image_item, image=self.photo)
+        self.shown = np.array(life, dtype=np.int8)
+
+
+    def move_view(self, origin: Tuple[float, float]) -> None:
+        '''viewport from the cell origin on (kept inside the pattern), redrawn'''
+
+        rows = max(0, self.rows - int(self.max_height / self.zoom))
+        cols = max(0, self.cols - int(self.max_width / self.zoom))
+        self.origin = (min(max(0, int(origin[0])), rows), min(max(0, int(origin[1])), cols))
+        self.draw_image(self.life)
+
+
+    def on_pan_start(self, event) -> None:
+        self.pan_start = (event.y, event.x, self.origin)
+
+
+    def on_pan(self, event) -> None:
+        if self.image_item is None:
+            return
+        y, x, origin = self.pan_start
+        self.move_view((origin[0] + (y - event.y) / self.zoom, origin[1] + (x - event.x) / self.zoom))
+
+
+    def on_zoom(self, event, steps: int) -> None:
+        '''zoom in (steps > 0) or out, the cell under the mouse stays in place'''
+
+        if self.image_item is None:
+            return
+        y, x = self.canvasy(event.y), self.canvasx(event.x)
+        cell = (self.origin[0] + y / self.zoom, self.origin[1] + x / self.zoom)
+        self.zoom = min(64.0, zoomed(self.zoom, steps))
+        self.move_view((cell[0] - y / self.zoom, cell[1] - x / self.zoom))
+
+
+    def set_render(self, render: str) -> None:
+        '''switch the render mode (see RENDER_MODES), the pattern is drawn anew'''
+
+        self.render = render
+        self.blank()
+        if hasattr(self, '_life'):
+            self.update(self._life)
+
+
+    def blank(self) -> None:
+        '''remove everything shown, the next pattern is drawn anew'''
+
+        self.delete(tk.ALL)
+        self.items = None
+        self.shown = None
+        self.image_item = None
+        self.photo = None
 
 
     def random(self, size: Tuple[int, int], density: float = 0.5) -> None:
+        self.offset = (0, 0)
         self.life = gol.create_rnd(size, density)
 
 
     def clean(self, size: Tuple[int, int]) -> None:
+        self.offset = (0, 0)
         self.life = np.zeros(size, dtype=np.int8)
 
 
     def shrink(self) -> None:
+        alive = np.argwhere(self.life)
+        if alive.size:
+            self.move_offset(tuple(alive.min(axis=0)))
         self.life = gol.shrink(self.life)
 
 
-    def next_gen(self, step: int = 1, geometry: str = 'Hard Edges') -> None:
+    def move_offset(self, origin: Tuple[int, int]) -> None:
+        '''the top left cell moved to origin (in cells of the current pattern)'''
+
+        self.offset = (self.offset[0] + int(origin[0]), self.offset[1] + int(origin[1]))
+
+
+    def next_gen(
+        self, step: int = 1, geometry: str = 'Hard Edges', engine: str = 'Dense', max_side: Optional[int] = None
+    ) -> None:
+        '''one step, a pattern larger than max_side on a side raises an Exception (see gol.run_gens)'''
+
+        if engine == 'Active' and geometry != 'Unbounded':
+            # keep the dirty tiles between calls as long as the pattern wasn't replaced
+            if self.active is None or self.active.geometry != geometry or self.active.life is not self.life:
+                self.active = ActiveLife(self.life, geometry=geometry)
+            self.life = self.active.run_gens(step)
+            return
+        origins = []
         self.life = gol.run_gens(
             life=self.life,
             gens=step,
-            geometry=geometry
-        )
\ No newline at end of file
+            geometry=geometry,
+            engine=engine,
+            origins=origins,
+            max_side=max_side
+        )
+        for origin in origins:
+            self.move_offset(origin)
\ No newline at end of file
@@ -1,35 +1,103 @@
 import numpy as np
-from itertools import product
+import io
 import re
+import warnings
 
 import gol_tools as gol
+from infinite_life import InfiniteLife
 
+from typing import TextIO
 Life = np.ndarray
 
 
 
 def to_life106(life: Life) -> str:
-    file = '#Life 1.06'
-    file += '\n' + '\n'.join(f'{r} {c}' for r, c in product(*map(range, life.shape)) if life[r, c])
-    return file
+    file = io.StringIO()
+    write_life106(life, file)
+    return file.getvalue()
+
+
+def write_life106(life: Life, file: TextIO, chunk: int = 2 ** 16) -> None:
+    '''write life as a Life 1.06 file, chunk cells at a time'''
+
+    write_coords_life106(np.column_stack(np.nonzero(life)), file, chunk)
 
 
 def from_life106(file: str) -> Life:
-    if not re.match(r'#Life 1\.06\n(\n-?\d+ -?\d+)*', file):
-        raise Exception('Invalid file format')
-    coords = {tuple(map(int, row.split())) for row in file.split('\n')[1:]}
-    if not coords:
+    coords = coords_from_life106(file)
+    if not coords.size:
         return np.zeros((1,1), dtype=np.int8)
-    min_x = min(coords, key=lambda x: x[0])[0]
-    max_x = max(coords, key=lambda x: x[0])[0]
-    min_y = min(coords, key=lambda x: x[1])[1]
-    max_y = max(coords, key=lambda x: x[1])[1]
-    life = np.zeros((max_x - min_x + 1, max_y - min_y + 1), dtype=np.int8)
-    for x, y in coords:
-        life[x - min_x, y - min_y] = 1
+    rows, cols = coords.T
+    top, left = rows.min(), cols.min()
+    life = np.zeros((rows.max() - top + 1, cols.max() - left + 1), dtype=np.int8)
+    life[rows - top, cols - left] = 1
     return life
 
 
+def coords_to_life106(coords: np.ndarray) -> str:
+    '''Life 1.06 file of the (row, col) pairs in coords, e.g. InfiniteLife.coords'''
+
+    file = io.StringIO()
+    write_coords_life106(coords, file)
+    return file.getvalue()
+
+
+def write_coords_life106(coords: np.ndarray, file: TextIO, chunk: int = 2 ** 16) -> None:
+    file.write('#Life 1.06\n')
+    coords = np.asarray(coords, dtype=np.int64).reshape(-1, 2)
+    for start in range(0, len(coords), chunk):
+        file.write(coord_lines(coords[start : start + chunk]))
+
+
+def coord_lines(coords: np.ndarray) -> str:
+    '''
+    the lines 'row col' of the (n, 2) array coords
+
+    every line is laid out in fixed width (sign, digits, ' ', sign, digits, '\\n') as a byte array,
+    then the unused signs and leading digits are cut out at once
+    '''
+
+    if not len(coords):
+        return ''
+    magnitude = np.abs(coords)
+    top = int(magnitude.max())
+    width = len(str(top))
+    if top < 2 ** 32:
+        magnitude = magnitude.astype(np.uint32)
+
+    text = np.empty((len(coords), 2, width + 2), dtype=np.uint8)
+    text[:, :, 0] = ord('-')
+    text[:, 0, -1] = ord(' ')
+    text[:, 1, -1] = ord('\n')
+    used = np.ones(text.shape, dtype=bool)
+    used[:, :, 0] = coords < 0
+    # digits from the units on, a digit is used if it or one before it is not 0
+    rest = magnitude
+    for k in range(width, 0, -1):
+        used[:, :, k] = rest > 0
+        rest, text[:, :, k] = np.divmod(rest, 10)
+    text[:, :, 1:-1] += ord('0')
+    used[:, :, width] = True
+    return text[used].tobytes().decode('ascii')
+
+
+def coords_from_life106(file: str) -> np.ndarray:
+    '''(n, 2) array of the (row, col) pairs of a Life 1.06 file, feed to InfiniteLife.from_coords (may hold duplicates)'''
+
+    if not re.match(r'#Life 1\.06[ \t\r]*(\n|$)', file):
+        raise Exception('Invalid file format')
+    try:
+        with warnings.catch_warnings():
+            # a file without cells
+            warnings.simplefilter('ignore', UserWarning)
+            coords = np.loadtxt(io.StringIO(file), dtype=np.int64, comments='#', ndmin=2)
+    except ValueError:
+        raise Exception('Invalid file format')
+    if coords.size and coords.shape[1] != 2:
+        raise Exception('Invalid file format')
+    return coords.reshape(-1, 2)
+
+
 
 def to_life105(life: Life) -> str:
     file = '#Life 1.05'
@@ -0,0 +1,149 @@
+import numpy as np
+import threading
+import time
+from collections import deque
+
+import gol_tools as gol
+from active_life import ActiveLife
+
+from typing import Deque, List, Optional, Tuple
+Life = np.ndarray
+
+
+# the simulation runs at most this many steps ahead of the display
+FRAME_BUFFER = 4
+# generations and frames per second are counted over the last this many seconds
+RATE_WINDOW = 1.0
+
+
+
+class Rate:
+    '''events per second, counted over the last window seconds'''
+
+
+    def __init__(self, window: float = RATE_WINDOW) -> None:
+        self.window = window
+        self.times: Deque[Tuple[float, int]] = deque()
+
+
+    def add(self, amount: int = 1) -> None:
+        self.times.append((time.monotonic(), amount))
+
+
+    @property
+    def value(self) -> float:
+        now = time.monotonic()
+        while self.times and now - self.times[0][0] > self.window:
+            self.times.popleft()
+        return sum(amount for _, amount in tuple(self.times)) / self.window
+
+
+
+class LifeLoop:
+    '''
+    Runs the generations of a GoL Pattern in a thread of its own
+
+    every step (of step generations, read anew for every step like geometry and engine) is put
+    into a buffer of at most FRAME_BUFFER frames, the simulation waits while it is full. So it runs
+    ahead of the display, but not faster: take() takes the frames that are due and drops all but
+    the newest of them. seed() continues from another pattern (e.g. after the displayed one was
+    edited), an exception of a step stops the loop and is kept in error. stop() does not wait
+    for the step that runs, its result is dropped.
+    Every frame comes with its offset, as LifeCanvas.offset. A step to a pattern of more than
+    max_side cells on a side stops the loop (see gol.run_gens)
+    '''
+
+
+    def __init__(
+        self, life: Life, step: int = 1, geometry: str = 'Hard Edges', engine: str = 'Dense',
+        offset: Tuple[int, int] = (0, 0), max_side: Optional[int] = None
+    ) -> None:
+        self.step = step
+        self.geometry = geometry
+        self.engine = engine
+        self.max_side = max_side
+        self.active: Optional[ActiveLife] = None
+        self.error: Optional[Exception] = None
+        self.generations = Rate()
+        self.frames: Deque[Tuple[Life, Tuple[int, int]]] = deque()
+        self.seeded: Optional[Tuple[Life, Tuple[int, int]]] = (life, offset)
+        self.stopped = False
+        # guards frames, seeded and stopped, notified whenever one of them changes
+        self.changed = threading.Condition()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+
+    @property
+    def running(self) -> bool:
+        return self.thread.is_alive()
+
+
+    def seed(self, life: Life, offset: Tuple[int, int] = (0, 0)) -> None:
+        '''continue from life, the frames not taken yet are dropped'''
+
+        with self.changed:
+            self.seeded = (life, offset)
+            self.frames.clear()
+            self.changed.notify()
+
+
+    def take(self, amount: int = 1) -> Optional[Tuple[Life, Tuple[int, int]]]:
+        '''the last of the next amount frames and its offset (or of all buffered ones, None if there is none), the others are dropped'''
+
+        with self.changed:
+            if not self.frames:
+                return None
+            for _ in range(min(amount, len(self.frames))):
+                frame = self.frames.popleft()
+            self.changed.notify()
+            return frame
+
+
+    def stop(self) -> None:
+        '''stop without waiting for the step that runs (the thread is a daemon), its frames are dropped'''
+
+        with self.changed:
+            self.stopped = True
+            self.frames.clear()
+            self.changed.notify()
+
+
+    def next_gen(self, life: Life, offset: Tuple[int, int]) -> Tuple[Life, Tuple[int, int]]:
+        '''life after one step and its offset, as LifeCanvas.next_gen'''
+
+        step, geometry, engine = self.step, self.geometry, self.engine
+        if engine == 'Active' and geometry != 'Unbounded':
+            if self.active is None or self.active.geometry != geometry or self.active.life is not life:
+                self.active = ActiveLife(life, geometry=geometry)
+            return self.active.run_gens(step), offset
+        origins: List[Tuple[int, int]] = []
+        life = gol.run_gens(life=life, gens=step, geometry=geometry, engine=engine, origins=origins, max_side=self.max_side)
+        for row, col in origins:
+            offset = (offset[0] + int(row), offset[1] + int(col))
+        return life, offset
+
+
+    def run(self) -> None:
+        life, offset = None, (0, 0)
+        while True:
+            with self.changed:
+                self.changed.wait_for(lambda: self.stopped or self.seeded is not None or len(self.frames) < FRAME_BUFFER)
+                if self.stopped:
+                    return
+                if self.seeded is not None:
+                    (life, offset), self.seeded = self.seeded, None
+            step = self.step
+            try:
+                new_life, new_offset = self.next_gen(life, offset)
+            except Exception as e:
+                self.error = e
+                return
+            with self.changed:
+                # a seed that came in during the step wins over its result, a stop drops it
+                if self.stopped:
+                    return
+                if self.seeded is None:
+                    life, offset = new_life, new_offset
+                    self.frames.append((life, offset))
+            self.generations.add(step)
@@ -1,19 +1,24 @@
 '''
 todo:
 - resizable canvas
-- proogress indicator / algorithm visualization / log-life switch
+- algorithm visualization / log-life switch
 - life 1.05 format
 '''
 
-from life_canvas import LifeCanvas
+from life_canvas import LifeCanvas, RENDER_MODES
 from life_files import *
-from reverse_quad_gen import quad_gen
+from reverse_cache import PredecessorCache
+from reverse_worker import ReverseJob, COUNT_BACKEND
+from life_loop import LifeLoop, Rate
+from active_life import ActiveLife
 import gol_tools as gol
 
 import tkinter as tk
 from tkinter import filedialog, messagebox
 import numpy as np
 import os
+import time
+import multiprocessing
 
 from typing import Optional, Tuple, List
 Life = np.ndarray
@@ -27,9 +32,24 @@ class GoLApp:
         ('Life 1.05', '*.lif'),
     )
 
+    # a reverse search is polled every poll_interval ms and stopped after reverse_timeout s of searching
+    # (see reverse_worker for the settings of the backends)
+    poll_interval = 50
+    reverse_timeout = 600
+    # largest n of a 2^n step size, HashLife leaps are cheap, the other engines step every generation
+    max_pow2 = 10
+    max_pow2_hashlife = 30
+    # longest side of a new pattern (larger ones are drawn as an image, see LifeCanvas)
+    max_side = 1024
+
     def __init__(self) -> None:
         self.width, self.height = 420, 420
         self.is_in_loop = False
+        self.loop: Optional[LifeLoop] = None
+        self.frames = Rate()
+        self.cache = PredecessorCache()
+        self.job: Optional[ReverseJob] = None
+        self.reverse_progress = ''
 
         self.root = tk.Tk()
         self.root.title('Game of Life in Reverse')
@@ -50,14 +70,28 @@ class GoLApp:
         self.controls_right.grid   (row=1, column=1, sticky='ns'  , padx=5, pady=2)
 
         self.create_menubar()
+        self.root.protocol('WM_DELETE_WINDOW', self.close)
         self.root.mainloop()
 
+
+    def close(self) -> None:
+        if self.job is not None:
+            self.job.cancel()
+        if self.loop is not None:
+            self.loop.stop()
+        self.root.destroy()
+
     
+    def set_render(self) -> None:
+        for cnv in (self.cnv_life_main, self.cnv_life_reverse):
+            cnv.set_render(self.var_render.get())
+
+
     @property
     def start_size(self) -> Tuple[int, int]:
         return (
-            min(32, max(1, self.var_rows.get())),
-            min(32, max(1, self.var_cols.get()))
+            min(self.max_side, max(1, self.var_rows.get())),
+            min(self.max_side, max(1, self.var_cols.get()))
         )
 
     @property
@@ -66,12 +100,30 @@ class GoLApp:
 
     @property
     def stepsize(self) -> int:
+        if self.var_stepsize_pow2.get():
+            return 2 ** self.scale_stepsize.get()
         return self.scale_stepsize.get()
 
     @property
     def geometry(self) -> str:
         return self.var_geometry.get()
 
+    @property
+    def engine(self) -> str:
+        return self.var_engine.get()
+
+    @property
+    def backend(self) -> str:
+        return self.var_backend.get()
+
+    @property
+    def workers(self) -> int:
+        return self.var_workers.get()
+
+    @property
+    def generations(self) -> int:
+        return self.var_generations.get()
+
     @property
     def loopspeed(self) -> int:
         return self.scale_loopspeed.get()
@@ -88,14 +140,23 @@ class GoLApp:
         if self.reversed_lifes:
             self.cnv_life_reverse.life = self.reversed_lifes[0]
         else:
-            self.cnv_life_reverse.delete(tk.ALL)
+            self.cnv_life_reverse.blank()
+
+        self.var_reverse_count.set(1 if len(self.reversed_lifes) > 0 else 0)
+        self.update_reverse_amount()
+
+
+    def update_reverse_amount(self) -> None:
+        '''label and spinbox range, while a search runs the spinbox goes one further (and asks for more)'''
 
         self.reversed_amount = len(self.reversed_lifes)
-        self.var_reverse_count.set(1 if self.reversed_amount > 0 else 0)
-        self.label_reverse.config(text=f'{self.reversed_amount} predecessors found.')
+        more = self.job is not None and self.job.running and self.job.backend != COUNT_BACKEND
+        self.label_reverse.config(
+            text=f'{self.reversed_amount}{"+" if more else ""} predecessors found.' +
+                 (f'\n{self.reverse_progress}' if self.reverse_progress else ''))
         self.spinbox_reverse.config(
             from_= 1 if self.reversed_amount > 0 else 0,
-            to=self.reversed_amount
+            to=self.reversed_amount + (1 if more else 0)
         )
 
 
@@ -103,36 +164,194 @@ class GoLApp:
         if self.is_in_loop:
             self.is_in_loop = False
             self.btn_looplife.configure(text='Start Loop')
+            self.loop.stop()
+            self.loop = None
+            self.label_rates.config(text='')
         else:
             self.is_in_loop = True
             self.btn_looplife.configure(text='Stop Loop')
+            self.loop = LifeLoop(
+                self.cnv_life_main.life, self.stepsize, self.geometry, self.engine,
+                self.cnv_life_main.offset, GoLApp.max_side
+            )
+            self.loop_shown = self.cnv_life_main.life
+            self.loop_clock = time.monotonic()
             self.loop_life()
 
 
     def loop_life(self) -> None:
-        if self.is_in_loop:
-            self.cnv_life_main.next_gen(step=self.stepsize, geometry=self.geometry)
-            self.root.after(self.loopspeed, self.loop_life)
+        '''
+        show the next step of the running LifeLoop every loopspeed ms
+
+        a step per loopspeed ms is due, if drawing took longer the steps in between are skipped.
+        The settings are handed on to the loop, a pattern that was changed meanwhile (edited, imported, ...)
+        is seeded into it
+        '''
+
+        if not self.is_in_loop:
+            return
+        loop = self.loop
+        loop.step, loop.geometry, loop.engine = self.stepsize, self.geometry, self.engine
+        if loop.error is not None:
+            self.control_loop_life()
+            messagebox.showerror(message=str(loop.error))
+            return
+
+        if self.cnv_life_main.life is not self.loop_shown:
+            loop.seed(self.cnv_life_main.life, self.cnv_life_main.offset)
+            self.loop_shown = self.cnv_life_main.life
+        now = time.monotonic()
+        due = max(1, round((now - self.loop_clock) * 1000 / self.loopspeed))
+        self.loop_clock = now
+        frame = loop.take(due)
+        if frame is not None:
+            life, self.cnv_life_main.offset = frame
+            self.cnv_life_main.life = self.loop_shown = life
+            self.frames.add()
+            self.update_status(loop.active)
+        self.label_rates.config(text=f'{loop.generations.value:.0f} generations/s, {self.frames.value:.0f} frames/s')
+        self.root.after(self.loopspeed, self.loop_life)
+
+
+    def step_life(self) -> None:
+        try:
+            self.cnv_life_main.next_gen(
+                step=self.stepsize, geometry=self.geometry, engine=self.engine, max_side=GoLApp.max_side
+            )
+        except Exception as e:
+            if self.is_in_loop:
+                self.control_loop_life()
+            messagebox.showerror(message=str(e))
+            return
+
+        self.update_status(self.cnv_life_main.active)
+
+
+    def update_status(self, active: Optional[ActiveLife]) -> None:
+        if self.engine == 'Active' and active is not None and active.active_counts:
+            counts = active.active_counts
+            total = self.cnv_life_main.rows * self.cnv_life_main.cols
+            self.label_status.config(text=f'{counts[-1]} of {total} cells re-evaluated in the last generation.')
+        elif self.geometry == 'Unbounded':
+            row, col = self.cnv_life_main.offset
+            self.label_status.config(text=f'Top left cell at row {row}, column {col} of the plane.')
+        else:
+            self.label_status.config(text='')
+
+
+    def toggle_stepsize_pow2(self) -> None:
+        '''range of the step size scale, also called when the engine changes'''
+
+        if self.var_stepsize_pow2.get():
+            top = GoLApp.max_pow2_hashlife if self.engine == 'HashLife' else GoLApp.max_pow2
+            self.scale_stepsize.config(from_=0, to=top)
+        else:
+            top = 10
+            self.scale_stepsize.config(from_=1, to=top)
+        self.scale_stepsize.set(min(self.scale_stepsize.get(), top))
 
 
     def reverse_life(self) -> None:
-        if self.cnv_life_main.rows not in range(1, 17) or self.cnv_life_main.cols not in range(1, 17):
-            messagebox.showerror(message='Reversing is only supported for\n1 <= rows <= 16\n1 <= cols <= 16')
+        '''start a reverse search in the background (see poll_reverse), or cancel the running one'''
+
+        if self.job is not None and self.job.running:
+            self.job.cancel()
+            self.reverse_progress = 'Search cancelled.'
+            return
+
+        if self.generations > 1 and not self.backend.startswith('Quadtree'):
+            messagebox.showerror(message='Reversing more than one generation is only\nsupported by the Quadtree backends')
+            return
+        goal = self.cnv_life_main.life
+        # complete predecessor sets are kept on disk
+        complete = self.backend == 'Row Sweep' or (self.backend == 'Quadtree' and self.generations == 1)
+        cached = self.cache.get(goal) if complete else None
+        if cached is not None:
+            self.reverse_progress = ''
+            self.reversed_lifes = cached
+            return
+        if self.backend == 'Row Sweep':
+            # the states per row grow exponentially with the shorter side
+            if min(goal.shape) > 12:
+                messagebox.showerror(message='Row sweeping is only supported for\nmin(rows, cols) <= 12')
+                return
+        elif not self.backend.startswith('SAT') and (
+            self.cnv_life_main.rows not in range(1, 17) or self.cnv_life_main.cols not in range(1, 17)
+        ):
+            messagebox.showerror(message='Reversing is only supported for\n1 <= rows <= 16\n1 <= cols <= 16\n(use a SAT backend for larger patterns)')
+            return
+
+        self.job = ReverseJob(goal, self.backend, self.generations, self.workers, self.cache.path)
+        self.reverse_progress = 'Searching...'
+        self.reversed_lifes = []
+        self.btn_reverse.config(text='Cancel')
+        self.root.after(GoLApp.poll_interval, self.poll_reverse, self.job)
+
+
+    def poll_reverse(self, job: ReverseJob) -> None:
+        '''take over the progress and the predecessors job sent so far, then poll again while it runs'''
+
+        if job is not self.job:
             return
-        self.reversed_lifes = quad_gen(self.cnv_life_main.life)
+        for message in job.poll():
+            if message[0] == 'level':
+                self.reverse_progress = f'Searching... pass {message[1] + 1}: {message[2]} candidates left.'
+            elif message[0] == 'lifes':
+                first = not self.reversed_lifes
+                self.reversed_lifes.extend(message[1])
+                self.update_reverse_amount()
+                if first:
+                    self.var_reverse_count.set(1)
+            elif message[0] == 'count':
+                n = message[1]
+                messagebox.showinfo(message='Garden of Eden (no predecessors)' if n == 0 else f'{n} predecessors')
+            elif message[0] == 'done':
+                self.reverse_progress = ''
+            elif message[0] == 'error':
+                self.reverse_progress = ''
+                messagebox.showerror(message=message[1])
+        if job.running and job.elapsed > GoLApp.reverse_timeout:
+            job.cancel()
+            self.reverse_progress = f'Search stopped after {GoLApp.reverse_timeout} s.'
+
+        if job.running:
+            self.root.after(GoLApp.poll_interval, self.poll_reverse, job)
+        else:
+            self.btn_reverse.config(text='Reverse')
+        self.update_reverse_amount()
+
+
+    def count_predecessors(self) -> None:
+        '''count the predecessors in the background like a reverse search (see poll_reverse), a running one is cancelled'''
+
+        if self.job is not None and self.job.running:
+            self.job.cancel()
+        self.job = ReverseJob(self.cnv_life_main.life, COUNT_BACKEND, cache_path=self.cache.path)
+        self.reverse_progress = 'Counting...'
+        self.btn_reverse.config(text='Cancel')
+        self.update_reverse_amount()
+        self.root.after(GoLApp.poll_interval, self.poll_reverse, self.job)
 
 
     def update_cnv_reversed(self, *_, **__) -> None:
         if not self.reversed_lifes:
-            self.cnv_life_reverse.delete(tk.ALL)
+            self.cnv_life_reverse.blank()
         else:
-            n = min(self.reversed_amount, max(1, self.var_reverse_count.get()))
+            try:
+                wanted = max(1, self.var_reverse_count.get())
+            except tk.TclError:
+                return
+            if self.job is not None and self.job.running and wanted > self.reversed_amount:
+                # search on for the next page of predecessors
+                self.job.request(self.reversed_amount + 256)
+            n = min(self.reversed_amount, wanted)
             self.cnv_life_reverse.life = self.reversed_lifes[n - 1]
 
 
     def reverse_to_active(self) -> None:
         try:
             self.cnv_life_main.life = self.cnv_life_reverse.life
+            self.cnv_life_main.offset = (0, 0)
             self.var_rows.set(self.cnv_life_main.rows)
             self.var_cols.set(self.cnv_life_main.cols)
         except:
@@ -156,7 +375,7 @@ class GoLApp:
             ext = os.path.splitext(file.name)[1]
             to_save = self.cnv_life_main.life
             if ext == '.life':
-                file.write(to_life106(to_save))
+                write_life106(to_save, file)
             elif ext == '.lif':
                 file.write(to_life105(to_save))
 
@@ -179,18 +398,20 @@ class GoLApp:
                 else:
                     raise Exception('Bad File.')
             
+            self.cnv_life_main.offset = (0, 0)
             self.cnv_life_main.life = new_life
 
 
     def filter_reversed(self, f: str) -> None:
-        if   f == 'Fewest Alive Cells':
-            self.reversed_lifes = gol.filter_least_cells(self.reversed_lifes)
-        elif f == 'Most Alive Cells':
-            self.reversed_lifes = gol.filter_most_cells(self.reversed_lifes)
-        elif f == 'Smallest Bounding Box':
-            self.reversed_lifes = gol.filter_bounding_box(self.reversed_lifes)
-        else:
+        if f not in gol.FILTERS:
             raise Exception(f'No such filter option \'{f}\' is supported.')
+        if self.job is not None:
+            # filters apply to the predecessors found so far, whatever the search still sends is dropped
+            self.job.cancel()
+            self.job = None
+            self.reverse_progress = ''
+            self.btn_reverse.config(text='Reverse')
+        self.reversed_lifes = list(gol.FILTERS[f](self.reversed_lifes))
 
 
     def create_life_main(self) -> LifeCanvas:
@@ -221,7 +442,7 @@ class GoLApp:
         self.menu_file.add_command(label='Import', command=self.import_file)
         self.menu_file.add_command(label='Export', command=self.export_file)
         self.menu_file.add_separator()
-        self.menu_file.add_command(label='Quit', command=self.root.destroy)
+        self.menu_file.add_command(label='Quit', command=self.close)
 
         # Settings Menu
         self.menu_settings = tk.Menu(master=self.menu, tearoff=0)
@@ -236,12 +457,80 @@ class GoLApp:
             label='Torus',
             value='Torus',
             variable=self.var_geometry)
+        self.menu_geometry.add_radiobutton(
+            label='Unbounded',
+            value='Unbounded',
+            variable=self.var_geometry)
         self.menu_settings.add_cascade(label='Geometry', menu=self.menu_geometry)
+        self.menu_engine = tk.Menu(master=self.menu_settings, tearoff=0)
+        self.var_engine = tk.StringVar()
+        self.var_engine.set('Dense')
+        self.var_engine.trace_add('write', lambda *args: self.toggle_stepsize_pow2())
+        self.menu_engine.add_radiobutton(
+            label='Dense',
+            value='Dense',
+            variable=self.var_engine)
+        self.menu_engine.add_radiobutton(
+            label='Bit-Packed',
+            value='Bit-Packed',
+            variable=self.var_engine)
+        self.menu_engine.add_radiobutton(
+            label='HashLife',
+            value='HashLife',
+            variable=self.var_engine)
+        self.menu_engine.add_radiobutton(
+            label='Active',
+            value='Active',
+            variable=self.var_engine)
+        self.menu_settings.add_cascade(label='Engine', menu=self.menu_engine)
+        self.menu_workers = tk.Menu(master=self.menu_settings, tearoff=0)
+        self.var_workers = tk.IntVar()
+        self.var_workers.set(1)
+        for n in sorted({1, 2, 4, 8, os.cpu_count() or 1}):
+            self.menu_workers.add_radiobutton(
+                label=str(n),
+                value=n,
+                variable=self.var_workers)
+        self.menu_settings.add_cascade(label='Reverse Workers', menu=self.menu_workers)
+        self.menu_generations = tk.Menu(master=self.menu_settings, tearoff=0)
+        self.var_generations = tk.IntVar()
+        self.var_generations.set(1)
+        for n in range(1, 5):
+            self.menu_generations.add_radiobutton(
+                label=str(n),
+                value=n,
+                variable=self.var_generations)
+        self.menu_settings.add_cascade(label='Reverse Generations', menu=self.menu_generations)
+        self.menu_backend = tk.Menu(master=self.menu_settings, tearoff=0)
+        self.var_backend = tk.StringVar()
+        self.var_backend.set('Quadtree')
+        for label in (
+            'Quadtree', 'Quadtree: One per Symmetry',
+            'Quadtree: Fewest Alive Cells', 'Quadtree: Smallest Bounding Box', 'Row Sweep',
+            'SAT: Find One', 'SAT: Find Many', 'SAT: Fewest Alive Cells'
+        ):
+            self.menu_backend.add_radiobutton(
+                label=label,
+                value=label,
+                variable=self.var_backend)
+        self.menu_settings.add_cascade(label='Reverse Backend', menu=self.menu_backend)
+        self.menu_render = tk.Menu(master=self.menu_settings, tearoff=0)
+        self.var_render = tk.StringVar()
+        self.var_render.set('Auto')
+        self.var_render.trace_add('write', lambda *args: self.set_render())
+        for label in RENDER_MODES:
+            self.menu_render.add_radiobutton(
+                label=label,
+                value=label,
+                variable=self.var_render)
+        self.menu_settings.add_cascade(label='Rendering', menu=self.menu_render)
 
         # Edit Menu
         self.menu_edit = tk.Menu(master=self.menu, tearoff=0)
         self.menu_edit.add_command(label='Reversed -> Active', command=self.reverse_to_active)
         self.menu_edit.add_command(label='Shrink Pattern', command=self.shrink_life)
+        self.menu_edit.add_command(label='Count Predecessors', command=self.count_predecessors)
+        self.menu_edit.add_command(label='Clear Reverse Cache', command=lambda: self.cache.clear())
         self.menu_filter = tk.Menu(master=self.menu_edit, tearoff=0)
         self.menu_filter.add_command(
             label='Fewest Alive Cells',
@@ -269,7 +558,7 @@ class GoLApp:
         self.btn_nextgen = tk.Button(
             master=frame_ctrl,
             text='Next Gen',
-            command=lambda: self.cnv_life_main.next_gen(self.stepsize, self.geometry),
+            command=self.step_life,
             pady=5, padx=5)
         self.btn_looplife = tk.Button(
             master=frame_ctrl,
@@ -292,10 +581,18 @@ class GoLApp:
         self.btn_clear.grid    (row=0, column=2, sticky='nswe')
         self.btn_random.grid   (row=0, column=3, sticky='nswe')
 
-        # Label + Scale for controlling stepsize
+        # Label + Checkbutton + Scale for controlling stepsize (optionally as power of 2)
+        self.frame_stepsize = tk.Frame(master=frame_ctrl)
         self.label_stepsize = tk.Label(
-            master=frame_ctrl,
+            master=self.frame_stepsize,
             text='Step Size')
+        self.var_stepsize_pow2 = tk.BooleanVar()
+        self.var_stepsize_pow2.set(False)
+        self.check_stepsize_pow2 = tk.Checkbutton(
+            master=self.frame_stepsize,
+            text='2^n',
+            variable=self.var_stepsize_pow2,
+            command=self.toggle_stepsize_pow2)
         self.scale_stepsize = tk.Scale(
             master=frame_ctrl,
             from_=1,
@@ -303,8 +600,14 @@ class GoLApp:
             orient=tk.HORIZONTAL)
         self.scale_stepsize.set(1)
 
+        self.label_stepsize.grid(row=0, column=0, sticky='e')
+        self.check_stepsize_pow2.grid(row=0, column=1, sticky='w')
+        self.frame_stepsize.rowconfigure(0, weight=1)
+        for c in range(2):
+            self.frame_stepsize.columnconfigure(c, weight=1)
+
         self.scale_stepsize.grid(row=1, column=0, sticky='nswe')
-        self.label_stepsize.grid(row=2, column=0, sticky='nswe')
+        self.frame_stepsize.grid(row=2, column=0, sticky='nswe')
 
         # Label + Scale for controlling loopspeed
         self.label_loopspeed = tk.Label(
@@ -372,8 +675,14 @@ class GoLApp:
         self.frame_density.grid(row=1, column=3, sticky='nswe')
         self.label_density.grid(row=2, column=3, sticky='nswe')
 
+        # Status lines below the controls
+        self.label_status = tk.Label(master=frame_ctrl, text='')
+        self.label_status.grid(row=3, column=0, columnspan=4, sticky='nswe')
+        self.label_rates = tk.Label(master=frame_ctrl, text='')
+        self.label_rates.grid(row=4, column=0, columnspan=4, sticky='nswe')
+
         # Final row and column config
-        for r in range(3):
+        for r in range(5):
             frame_ctrl.rowconfigure(r, weight=1)
         for c in range(4):
             frame_ctrl.columnconfigure(c, weight=1)
@@ -422,4 +731,5 @@ class GoLApp:
 
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()
     app = GoLApp()
\ No newline at end of file
@@ -0,0 +1,153 @@
+import numpy as np
+import os
+import sqlite3
+import time
+import zlib
+from contextlib import contextmanager
+
+from gol_tools import *
+
+from typing import Iterator, List, Optional, Tuple
+Life = np.ndarray
+
+
+
+CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'game-of-life-in-reverse', 'predecessors.sqlite')
+
+
+
+def cache_orientation(goal: Life) -> Tuple[str, Life]:
+    '''
+    the symmetry that turns goal into its cache form, and that form
+
+    the cache form is the mirror image of goal whose shrunk pattern comes first (as canonical),
+    ties are broken by the whole pattern: the predecessors depend on the dead rims of goal as well
+    '''
+
+    def order(name: str) -> Tuple:
+        image = SYMMETRIES[name](goal)
+        small = shrink(image)
+        return small.shape, small.astype(np.int8).tobytes(), image.shape, image.astype(np.int8).tobytes()
+
+    name = min(SYMMETRIES, key=order)
+    return name, np.ascontiguousarray(SYMMETRIES[name](goal)).astype(np.int8)
+
+
+def pack_lifes(lifes: List[Life]) -> bytes:
+    '''equally shaped patterns bit packed and compressed'''
+    return zlib.compress(np.packbits(np.array(lifes, dtype=np.uint8)).tobytes())
+
+
+def unpack_lifes(data: bytes, n: int, shape: Tuple[int, int]) -> List[Life]:
+    if n == 0:
+        return []
+    bits = np.unpackbits(np.frombuffer(zlib.decompress(data), dtype=np.uint8), count=n * shape[0] * shape[1])
+    return list(bits.astype(np.int8).reshape(n, *shape))
+
+
+
+class PredecessorCache:
+    '''
+    Persistent store of the complete predecessor sets of goals (an SQLite file at path)
+
+    entries are found by the cache form of the goal (see cache_orientation) and the geometry the
+    predecessors are valid in, so all mirror images of a goal share one entry. The predecessors are
+    stored bit packed and zlib compressed; when all entries together exceed max_bytes, the least
+    recently used ones are evicted. Sets of more than max_lifes predecessors are not stored.
+    Every call opens its own connection, so the cache can be used from any thread
+    '''
+
+
+    def __init__(self, path: str = CACHE_PATH, max_bytes: int = 256 * 2 ** 20, max_lifes: int = 2 ** 18) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_lifes = max_lifes
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self.connect() as db:
+            db.execute('''
+                CREATE TABLE IF NOT EXISTS predecessors (
+                    key TEXT PRIMARY KEY, n INTEGER, rows INTEGER, cols INTEGER,
+                    data BLOB, size INTEGER, used REAL
+                )
+            ''')
+
+
+    @contextmanager
+    def connect(self) -> Iterator[sqlite3.Connection]:
+        '''connection that commits (or rolls back) and closes at the end of the with block'''
+
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+
+    @staticmethod
+    def key(goal: Life, geometry: str) -> Tuple[str, str]:
+        '''(symmetry to the cache form, entry key)'''
+
+        name, form = cache_orientation(goal)
+        return name, f'{geometry}:{form.shape[0]}x{form.shape[1]}:{form.tobytes().hex()}'
+
+
+    def get(self, goal: Life, geometry: str = 'Hard Edges') -> Optional[List[Life]]:
+        '''the cached predecessors of goal, None if there are none'''
+
+        name, key = PredecessorCache.key(goal, geometry)
+        with self.connect() as db:
+            row = db.execute('SELECT n, rows, cols, data FROM predecessors WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            db.execute('UPDATE predecessors SET used = ? WHERE key = ?', (time.time(), key))
+        n, rows, cols, data = row
+        back = SYMMETRIES[INVERSES[name]]
+        return [np.ascontiguousarray(back(life)) for life in unpack_lifes(data, n, (rows, cols))]
+
+
+    def put(self, goal: Life, lifes: List[Life], geometry: str = 'Hard Edges') -> None:
+        '''store all predecessors of goal, sets larger than max_bytes are not stored'''
+
+        name, key = PredecessorCache.key(goal, geometry)
+        shape = (goal.shape[0] + 2, goal.shape[1] + 2)
+        forms = [SYMMETRIES[name](life) for life in lifes]
+        rows, cols = forms[0].shape if forms else SYMMETRIES[name](np.zeros(shape)).shape
+        data = pack_lifes(forms) if forms else b''
+        if len(data) > self.max_bytes:
+            return
+        with self.connect() as db:
+            db.execute(
+                'INSERT OR REPLACE INTO predecessors VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (key, len(forms), rows, cols, data, len(data), time.time())
+            )
+            total = db.execute('SELECT COALESCE(SUM(size), 0) FROM predecessors').fetchone()[0]
+            for old, size in db.execute('SELECT key, size FROM predecessors ORDER BY used').fetchall():
+                if total <= self.max_bytes:
+                    break
+                db.execute('DELETE FROM predecessors WHERE key = ?', (old,))
+                total -= size
+
+
+    def storing(self, goal: Life, lifes: Iterator[Life], geometry: str = 'Hard Edges') -> Iterator[Life]:
+        '''
+        passes lifes through, once they are exhausted they are stored as the predecessors of goal
+
+        more than max_lifes of them, or more than max_bytes bit packed, are too many to be stored,
+        from then on they are only passed through
+        '''
+
+        found: Optional[List[Life]] = []
+        for life in lifes:
+            if found is not None:
+                found.append(life)
+                if len(found) > self.max_lifes or len(found) * life.size > 8 * self.max_bytes:
+                    found = None
+            yield life
+        if found is not None:
+            self.put(goal, found, geometry)
+
+
+    def clear(self) -> None:
+        with self.connect() as db:
+            db.execute('DELETE FROM predecessors')
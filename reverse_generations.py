@@ -0,0 +1,96 @@
+import numpy as np
+
+from gol_tools import *
+from reverse_quad_gen import quad_gen, iter_predecessors
+
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+Life = np.ndarray
+
+
+
+# patterns with a larger side (after shrinking) are not reversed any further
+MAX_SIDE = 16
+
+
+
+def life_key(life: Life) -> Tuple[Tuple[int, int], bytes]:
+    return life.shape, life.tobytes()
+
+
+def reverse_step(life: Life, bound: Optional[str] = None) -> Iterator[Life]:
+    '''predecessors of life, only the ones kept by FILTERS[bound] (streamed if there is no bound)'''
+
+    if bound is None:
+        return iter_predecessors(life)
+    return iter(FILTERS[bound](quad_gen(life)))
+
+
+
+def reverse_generations(
+    goal: Life, generations: int,
+    beam: Optional[int] = None, bound: Optional[str] = None,
+    levels: Optional[List[int]] = None
+) -> List[Life]:
+    '''
+    ancestors of goal, generations steps back (breadth first)
+
+    every level reverses the patterns of the level before with quad_gen. Each found predecessor is
+    turned into its canonical form (shrunk and mirrored, see canonical), so predecessors that only
+    differ by dead rims or a symmetry are searched only once on the next level.
+    Between the levels the frontier is pruned: bound names one of FILTERS that is applied to the
+    whole level, beam keeps only that many of its patterns (the fewest alive cells first).
+    Patterns larger than MAX_SIDE are dropped, the size of every level is appended to levels.
+    Returns the canonical forms of the last level
+    '''
+
+    frontier = [canonical(goal)]
+    for _ in range(generations):
+        found: Dict[Tuple[Tuple[int, int], bytes], Life] = {}
+        for life in frontier:
+            if max(life.shape) <= MAX_SIDE:
+                for pred in reverse_step(life):
+                    small = canonical(pred)
+                    found.setdefault(life_key(small), small)
+        level = LifeStack(found.values())
+        if bound is not None:
+            level = FILTERS[bound](level)
+        if beam is not None:
+            level = level.select(np.argsort(level.population, kind='stable')[:beam])
+        frontier = list(level)
+        if levels is not None:
+            levels.append(len(frontier))
+    return frontier
+
+
+
+def iter_ancestors(
+    goal: Life, generations: int,
+    beam: Optional[int] = None, bound: Optional[str] = None
+) -> Iterator[Life]:
+    '''
+    like reverse_generations, but depth first: yields every ancestor as soon as it is found
+
+    only the predecessors of one pattern per level are pending at a time (streamed by
+    iter_predecessors if there is no bound), besides that just the keys of the canonical forms
+    seen per level are kept. Pruning is therefore local: bound is applied to the predecessors
+    of each pattern, beam caps the amount of patterns per level (the first ones found)
+    '''
+
+    seen: List[Set[Tuple[Tuple[int, int], bytes]]] = [set() for _ in range(generations + 1)]
+
+    def visit(life: Life, depth: int) -> Iterator[Life]:
+        if depth == generations:
+            yield life
+            return
+        if max(life.shape) > MAX_SIDE:
+            return
+        below = seen[depth + 1]
+        for pred in reverse_step(life, bound):
+            if beam is not None and len(below) >= beam:
+                return
+            small = canonical(pred)
+            if life_key(small) not in below:
+                below.add(life_key(small))
+                yield from visit(small, depth + 1)
+
+    yield from visit(canonical(goal), 0)
@@ -1,5 +1,5 @@
 from gol_tools import *
-from square_cell import SquareCell
+from square_cell import SquareCell, arc_consistency
 
 import numpy as np
 
@@ -19,6 +19,8 @@ def quad_2n(goal: Life) -> List[Life]:
 
     Then 2x2 SquareCell objects get merged to a new SquareCell object,
     and we get a new SquareCell array 1/4 the size of the previous.
+    Before the first and after every merge, candidates that fit no candidate of an
+    overlapping cell of the whole array are dropped (see arc_consistency).
 
     That process is iterated until the array consists of just one SquareCell object,
     which now holds all valid predecessors to the goal pattern.
@@ -29,9 +31,6 @@ def quad_2n(goal: Life) -> List[Life]:
 
     new_cells = np.ndarray(shape=(width, width), dtype=SquareCell)
 
-    # dict of all kid of 3x3 predecessors of a single on/off cell
-    pre = single_cell_predecessors()
-
 
     # initialize first newCell[,]
     print(f'Level {log_two}...')
@@ -42,7 +41,8 @@ def quad_2n(goal: Life) -> List[Life]:
             status = ['off', 'on'][goal[row, col]]
             row_pos = 't' if row == 0 else ('d' if row == width - 1 else '')
             col_pos = 'l' if col == 0 else ('r' if col == width - 1 else '')
-            new_cells[row, col] = SquareCell(pre[status + row_pos + col_pos], pos)
+            new_cells[row, col] = SquareCell.leaf(status + row_pos + col_pos, pos)
+    prune_cells(new_cells, 1)
 
     # main merging loop of SquareCells
     for level in range(log_two - 1, -1, -1):
@@ -60,11 +60,25 @@ def quad_2n(goal: Life) -> List[Life]:
                                             col % 2, 'quad',
                                             old_cells[oldRow    , oldCol], old_cells[oldRow    , oldCol + 1],
                                             old_cells[oldRow + 1, oldCol], old_cells[oldRow + 1, oldCol + 1])
+        if width > 1:
+            prune_cells(new_cells, 2 ** (log_two - level))
 
     return new_cells[0, 0].pats
 
 
 
+def prune_cells(cells: np.ndarray, side: int) -> None:
+    '''arc_consistency over a square array of SquareCell objects of side x side goal cells each'''
+
+    width = cells.shape[0]
+    found = list(cells.flat)
+    pruned = arc_consistency(found, [(row * side, col * side) for row in range(width) for col in range(width)])
+    for i, cell in enumerate(found):
+        cells.flat[i] = cell
+    print(f'{pruned} candidates pruned.')
+
+
+
 
 
 
@@ -1,49 +1,742 @@
 import numpy as np
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from math import inf
 
 from gol_tools import *
-from square_cell import SquareCell
+from square_cell import SquareCell, CountCell, arc_consistency, NO_SPAN
 from square_tree import SquareTree
 
-from typing import List, Tuple
+from typing import Callable, Dict, Hashable, Iterator, List, Optional, Sequence, Tuple
 Life = np.ndarray
+# (shape, top left coordinate) of a rectangle of a partition of goal
+Part = Tuple[Tuple[int, int], Tuple[int, int]]
 
 
-def quad_gen(goal: Life) -> List[Life]:
-    '''generalized verion of quad_2n, works for mxn with 1 <= m,n'''
+# below this many candidates on the left/top side a join isn't worth splitting across processes
+PARALLEL_JOIN_MIN = 2 ** 14
+# pruned_children starts from goal blocks of at most this many cells, merged whole (and memoized)
+MEMO_BLOCK_CELLS = 4
+# the predecessors of a goal are 2 cells larger, SquareCell rows hold at most 32 cells
+MAX_COUNT_SIDE = 30
+
+
+
+def leaf_kind(goal: Life, cord: Tuple[int, int]) -> str:
+    '''kind of single cell predecessors of goal[cord], restricted on the rims of goal (see single_cell_predecessors)'''
+
+    height, width = goal.shape
+    status = ['off', 'on'][goal[cord]]
+    row_pos = ('t' if cord[0] == 0 else '') + ('d' if cord[0] == height - 1 else '')
+    col_pos = ('l' if cord[1] == 0 else '') + ('r' if cord[1] == width - 1 else '')
+    return status + row_pos + col_pos
+
+
+def leaf_cell(goal: Life, cord: Tuple[int, int], pos: int) -> SquareCell:
+    '''SquareCell of the single cell predecessors of goal[cord], restricted on the rims of goal'''
+    return SquareCell.leaf(leaf_kind(goal, cord), pos)
+
+
+def twig_children(twig: SquareTree, cord: Tuple[int, int]) -> List[Tuple[SquareTree, Tuple[int, int], int]]:
+    '''(subtree, top left coordinate, pos) of the children of a non leaf twig, in merge order'''
+
+    off_height, off_width = twig.tl.shape
+    if twig.type == 'vertical':
+        return [(twig.tl, cord, 3), (twig.dl, (cord[0] + off_height, cord[1]), 2)]
+    children = [(twig.tl, cord, 0), (twig.tr, (cord[0], cord[1] + off_width), 1)]
+    if twig.type == 'quad':
+        children += [
+            (twig.dl, (cord[0] + off_height, cord[1]), 0),
+            (twig.dr, (cord[0] + off_height, cord[1] + off_width), 1)
+        ]
+    return children
+
+
+def rim_sides(goal: Life, shape: Tuple[int, int], cord: Tuple[int, int]) -> str:
+    '''sides of the rectangle shape at cord that border the rest of goal (e.g. 'tdlr', top down left right)'''
+
+    return (
+        ('t' if cord[0] > 0 else '') + ('d' if cord[0] + shape[0] < goal.shape[0] else '') +
+        ('l' if cord[1] > 0 else '') + ('r' if cord[1] + shape[1] < goal.shape[1] else '')
+    )
+
+
+class CellMemo:
+    '''
+    Least recently used table of merged cells, holding at most max_bytes of candidate rows
+
+    the merged cell of a subtree only depends on the goal block it covers and on which of its sides
+    are rims of goal (see block_key), so it is reused for every subtree with the same key, also
+    across goals (see tree_merge and pruned_children)
+    '''
+
+
+    def __init__(self, max_bytes: int = 64 * 2 ** 20) -> None:
+        self.max_bytes = max_bytes
+        self.cells: OrderedDict[Hashable, SquareCell] = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+
+    def get(self, key: Hashable, pos: int) -> Optional[SquareCell]:
+        cell = self.cells.get(key)
+        if cell is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.cells.move_to_end(key)
+        return SquareCell(cell.rows, cell.width, pos)
+
+
+    def put(self, key: Hashable, cell: SquareCell) -> None:
+        '''keep cell (its rows become read only, they are shared), evicting the least recently used ones'''
+
+        if cell.rows.nbytes > self.max_bytes or key in self.cells:
+            return
+        cell.rows.flags.writeable = False
+        self.cells[key] = cell
+        self.bytes += cell.rows.nbytes
+        while self.bytes > self.max_bytes:
+            _, old = self.cells.popitem(last=False)
+            self.bytes -= old.rows.nbytes
+
+
+    def clear(self) -> None:
+        self.cells.clear()
+        self.bytes = 0
+
+
+# shared by all searches of this process
+MERGE_MEMO = CellMemo()
+
+
+def block_key(goal: Life, shape: Tuple[int, int], cord: Tuple[int, int]) -> Hashable:
+    '''memo key of the merged cell of the rectangle shape at cord (see CellMemo)'''
+
+    block = goal[cord[0] : cord[0] + shape[0], cord[1] : cord[1] + shape[1]]
+    return ('block', shape, rim_sides(goal, shape, cord), block.astype(np.int8).tobytes())
+
+
+def tree_merge(
+    goal: Life, twig: SquareTree, cord: Tuple[int, int], pos: int,
+    memo: Optional[CellMemo] = MERGE_MEMO
+) -> SquareCell:
+    '''
+    recursive merging according to tree structure of rectangles
+
+    the merged cell of a subtree only depends on the goal block it covers and on which of its sides
+    are rims of goal, blocks seen before (e.g. blank regions) are taken from memo
+    '''
+
+    if twig.type == 'leaf':
+        return leaf_cell(goal, cord, pos)
+    key = None
+    if memo is not None:
+        key = block_key(goal, twig.shape, cord)
+        cell = memo.get(key, pos)
+        if cell is not None:
+            return cell
+    cells = [tree_merge(goal, *child, memo=memo) for child in twig_children(twig, cord)]
+    merged = SquareCell.merge(pos, twig.type, *cells)
+    if memo is not None:
+        memo.put(key, merged)
+    return merged
+
+
+
+def tree_parts(tree: SquareTree, block: int = 1) -> Tuple[List[Tuple], List[Tuple[SquareTree, Tuple[int, int], int]]]:
+    '''
+    (twigs, leaves) of tree, top down
+
+    twigs holds (twig, top left coordinate, pos, [(shape, coordinate) of its children]),
+    leaves holds (subtree, top left coordinate, pos) of the leaves, and of the subtrees below
+    the root of at most block cells
+    '''
+
+    twigs, leaves = [], []
+    def walk(twig: SquareTree, cord: Tuple[int, int], pos: int) -> None:
+        if twig.type == 'leaf' or (twig is not tree and twig.shape[0] * twig.shape[1] <= block):
+            leaves.append((twig, cord, pos))
+        else:
+            children = twig_children(twig, cord)
+            twigs.append((twig, cord, pos, [(child.shape, child_cord) for child, child_cord, _ in children]))
+            for child in children:
+                walk(*child)
+    walk(tree, (0, 0), 0)
+    return twigs, leaves
+
+
+
+def pruned_children(
+    goal: Life, tree: SquareTree, pruned: Optional[List[int]] = None, counting: bool = False,
+    group: Sequence[str] = (), memo: Optional[CellMemo] = MERGE_MEMO,
+    objective: Optional[str] = None, limit: int = 0, cut: Optional[List[int]] = None,
+    start: Optional[Dict[Part, SquareCell]] = None,
+    sizes: Optional[List[int]] = None
+) -> List[SquareCell]:
+    '''
+    cells of the children of a non leaf tree (in merge order), merged level by level with pruning
+
+    the partition of goal starts from the blocks of at most MEMO_BLOCK_CELLS cells (see start_partition).
+    Every pass prunes the partition (see prune_bounds and prune_partition) and merges every twig whose
+    children are merged already (see merge_level), until the children of the root are left.
+    counting = True merges CountCell objects (see quad_count) instead.
+    group holds symmetries of goal (see symmetries), mirrored twigs are merged once.
+    With an objective (see OBJECTIVES) only candidates and combinations whose lower bound of it is at
+    most limit are kept (see PartitionBounds and bounded_merge), the least dropped bounds are appended to cut.
+    start replaces the starting cells by leaf cells, ((1, 1), coordinate) -> cell (e.g. already pruned ones)
+    '''
+
+    twigs, leaves = tree_parts(tree, 1 if counting or start is not None else MEMO_BLOCK_CELLS)
+    root = twigs.pop(0)
+    cut = [] if cut is None else cut
+
+    # current partition of goal, (shape, cord) -> cell
+    cells = dict(start) if start is not None else start_partition(goal, leaves, counting, memo)
+    while True:
+        if objective is not None:
+            cells = prune_bounds(goal, cells, objective, limit, cut)
+        cells = prune_partition(cells, pruned, sizes)
+        if all(key in cells for key in root[3]):
+            return [cells[key] for key in root[3]]
+        merge_level(goal, cells, twigs, () if counting else group, twig_merge(goal, cells, counting, objective, limit, cut))
+
+
+
+def start_partition(goal: Life, leaves: List[Tuple], counting: bool, memo: Optional[CellMemo]) -> Dict[Part, SquareCell]:
+    '''
+    (shape, cord) -> cell of the leaves of tree_parts, merged whole by tree_merge (CountCell leaves for counting)
+
+    equal blocks are taken from memo, whatever surrounds them. That is sound, pruning only drops
+    candidates that fit no predecessor and the join of the root is exact
+    '''
+
+    if counting:
+        return {
+            ((1, 1), cord): CountCell.leaf(leaf_kind(goal, cord), pos, rim_sides(goal, (1, 1), cord))
+            for _, cord, pos in leaves
+        }
+    return {(twig.shape, cord): tree_merge(goal, twig, cord, pos, memo) for twig, cord, pos in leaves}
+
+
+def prune_bounds(
+    goal: Life, cells: Dict[Part, SquareCell], objective: str, limit: int, cut: List[int]
+) -> Dict[Part, SquareCell]:
+    '''cells without the candidates whose lower bound of objective exceeds limit (see PartitionBounds), the least dropped bound is appended to cut'''
+
+    bounds = PartitionBounds(goal, objective, list(cells), list(cells.values())).bounds()
+    dropped = [bound[bound > limit] for bound in bounds]
+    if any(len(d) for d in dropped):
+        cut.append(min(int(d.min()) for d in dropped if len(d)))
+    return {key: cell.select(bound <= limit) for (key, cell), bound in zip(cells.items(), bounds)}
+
+
+def prune_partition(
+    cells: Dict[Part, SquareCell], pruned: Optional[List[int]], sizes: Optional[List[int]]
+) -> Dict[Part, SquareCell]:
+    '''arc_consistency over the cells of a partition, the dropped amount is appended to pruned, the amount left to sizes'''
+
+    found = list(cells.values())
+    amount = arc_consistency(found, [cord for _, cord in cells])
+    if pruned is not None:
+        pruned.append(amount)
+    if sizes is not None:
+        sizes.append(sum(len(cell) for cell in found))
+    return dict(zip(cells, found))
+
+
+Merge = Callable[[SquareTree, Tuple[int, int], int, List[Part], List[SquareCell]], SquareCell]
+
+
+def twig_merge(
+    goal: Life, cells: Dict[Part, SquareCell], counting: bool,
+    objective: Optional[str], limit: int, cut: List[int]
+) -> Merge:
+    '''how merge_level merges the children of a twig: counted, bounded by objective (see bounded_merge) or all combinations'''
+
+    if counting:
+        return lambda twig, cord, pos, children, merging: CountCell.merge(
+            pos, twig.type, *merging, sides=rim_sides(goal, twig.shape, cord)
+        )
+    if objective is not None:
+        bounds = PartitionBounds(goal, objective, list(cells), list(cells.values()))
+        return lambda twig, cord, pos, children, merging: bounded_merge(bounds, children, pos, twig.type, limit, cut, merging)
+    return lambda twig, cord, pos, children, merging: SquareCell.merge(pos, twig.type, *merging)
+
+
+def merge_level(
+    goal: Life, cells: Dict[Part, SquareCell], twigs: List[Tuple], group: Sequence[str], merge: Merge
+) -> None:
+    '''
+    replace the children of every twig that are all in cells by their merged cell (see twig_merge)
+
+    a twig that a symmetry of group maps onto a twig merged before is mirrored from that one instead
+    '''
+
+    level: Dict[Part, SquareCell] = {}
+    for twig, cord, pos, children in twigs:
+        if all(key in cells for key in children):
+            merging = [cells.pop(key) for key in children]
+            mirror = next((
+                (key, sym) for sym in group
+                for key in [mirrored(goal, twig.shape, cord, sym)] if key in level
+            ), None)
+            if mirror:
+                merged = level[mirror[0]].transformed(INVERSES[mirror[1]], pos)
+            else:
+                merged = merge(twig, cord, pos, children, merging)
+            cells[(twig.shape, cord)] = level[(twig.shape, cord)] = merged
+
+
+
+def quad_gen(
+    goal: Life, workers: int = 1, pruned: Optional[List[int]] = None, orbits: bool = False,
+    objective: Optional[str] = None, k: int = 1, sizes: Optional[List[int]] = None
+) -> List[Life]:
+    '''
+    generalized verion of quad_2n, works for mxn with 1 <= m,n
+
+    workers > 1 spreads the search over a process pool (see parallel_tree_merge),
+    otherwise the merge is pruned between levels (see pruned_children), the amount of
+    candidates pruned per level is appended to pruned, the amount left to sizes.
+    The predecessors of a symmetric goal are symmetric as a whole, so mirrored parts of the
+    search are only done once (see pruned_children and root_join);
+    orbits = True returns only one predecessor out of every set of mirror images (see expand_orbits).
+    With an objective only the k predecessors that minimize it are returned (see best_predecessors)
+    '''
 
     # tree structure of pattern to merge
     tree = SquareTree(goal.shape)
-    # general dimensions of input pattern
-    height, width = goal.shape
-    # dict of all kid of 3x3 predecessors of a single on/off cell
-    pre = single_cell_predecessors()
+    group = symmetries(goal)[1:]
 
+    if objective is not None:
+        return best_predecessors(goal, objective, k, pruned, orbits, sizes=sizes)
+    if tree.type == 'leaf':
+        result = leaf_cell(goal, (0, 0), 0)
+    elif workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            result = parallel_tree_merge(pool, workers, goal, tree)
+    else:
+        return root_join(goal, tree, pruned_children(goal, tree, pruned, group=group, sizes=sizes), group, orbits).pats
+    if orbits:
+        result = result.select(orbit_representatives(result, group))
+    return result.pats
 
-    def tree_merge(twig: SquareTree, cord: Tuple[int, int], pos: int) -> SquareCell:
-        '''recursive merging according to tree structure of rectangles'''
-        
-        if twig.type == 'leaf':
-            status = ['off', 'on'][goal[cord]]
-            row_pos = ('t' if cord[0] == 0 else '') + ('d' if cord[0] == height - 1 else '')
-            col_pos = ('l' if cord[1] == 0 else '') + ('r' if cord[1] == width - 1 else '')
-            return SquareCell(pre[status + row_pos + col_pos], pos)
 
-        off_height, off_width = twig.tl.shape
 
-        if twig.type == 'vertical':
-            top = tree_merge(twig.tl, cord, 3)
-            down = tree_merge(twig.dl, (cord[0] + off_height, cord[1]), 2)
-            return SquareCell.merge(pos, 'vertical', top, down)
+# symmetries
+
+def mirrored(
+    goal: Life, shape: Tuple[int, int], cord: Tuple[int, int], symmetry: str
+) -> Tuple[Tuple[int, int], Tuple[int, int]]:
+    '''(shape, cord) of the rectangle of goal that symmetry maps the rectangle shape at cord onto'''
+
+    frame = np.zeros(goal.shape, dtype=bool)
+    frame[cord[0] : cord[0] + shape[0], cord[1] : cord[1] + shape[1]] = True
+    rows, cols = np.nonzero(SYMMETRIES[symmetry](frame))
+    return (
+        (int(rows.max() - rows.min() + 1), int(cols.max() - cols.min() + 1)),
+        (int(rows.min()), int(cols.min()))
+    )
+
+
+def orbit_representatives(cell: SquareCell, group: Sequence[str], swap: Optional[str] = None) -> np.ndarray:
+    '''
+    mask of the candidates that come first (as tuples of packed rows) among their images under group
+
+    with swap, a candidate also counts if its swap image comes first (root_join only makes one of both)
+    '''
+
+    def less(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        differ = a != b
+        first = (np.arange(len(a)), differ.argmax(axis=1))
+        return differ[first] & (a[first] < b[first])
+
+    rows = cell.rows
+    images = {sym: cell.transformed(sym, cell.pos).rows for sym in group}
+    least = rows
+    for image in images.values():
+        least = np.where(less(image, least)[:, None], image, least)
+    keep = (least == rows).all(axis=1)
+    if swap is not None:
+        keep |= (least == images[swap]).all(axis=1)
+    return keep
+
+
+def root_join(goal: Life, tree: SquareTree, cells: List[SquareCell], group: Sequence[str], orbits: bool) -> SquareCell:
+    '''
+    the last merge of quad_gen, of the children cells of the root
+
+    it is a join of 2 halves (for quads the merged top and down rows). If a symmetry of goal maps one
+    half onto the other, the second half is mirrored from the first one instead of merged; for orbits
+    the join then only makes one of the combinations (i, j) and (j, i), the mirror images of each other
+    '''
+
+    children = twig_children(tree, (0, 0))
+    if tree.type == 'quad':
+        kind = 'vertical'
+        first = SquareCell.merge_horizontal(cells[0], cells[1], 0)
+        halves = [
+            ((children[0][0].shape[0], goal.shape[1]), (0, 0)),
+            ((children[2][0].shape[0], goal.shape[1]), children[2][1])
+        ]
+    else:
+        kind = tree.type
+        first = cells[0]
+        halves = [(child.shape, cord) for child, cord, _ in children]
+
+    swap = next((sym for sym in group if INVERSES[sym] == sym and mirrored(goal, *halves[0], sym) == halves[1]), None)
+    if swap is not None:
+        second = first.transformed(swap, 2 if tree.type == 'quad' else cells[1].pos)
+    elif tree.type == 'quad':
+        second = SquareCell.merge_horizontal(cells[2], cells[3], 2)
+    else:
+        second = cells[1]
 
-        top_left = tree_merge(twig.tl, cord, 0)
-        top_right = tree_merge(twig.tr, (cord[0], cord[1] + off_width), 1)
+    ordered = orbits and swap is not None
+    if kind == 'vertical':
+        result = SquareCell.merge_vertical(first, second, 0, ordered)
+    else:
+        result = SquareCell.merge_horizontal(first, second, 0, ordered)
+    if orbits:
+        result = result.select(orbit_representatives(result, group, swap if ordered else None))
+    return result
+
+
+def expand_orbits(goal: Life, lifes: List[Life]) -> List[Life]:
+    '''all predecessors of goal out of one per set of mirror images (as returned by quad_gen with orbits)'''
+
+    if not lifes:
+        return []
+    cell = SquareCell.from_pats(lifes, 0)
+    images = [cell.rows] + [cell.transformed(sym, 0).rows for sym in symmetries(goal)[1:]]
+    return SquareCell(np.unique(np.concatenate(images), axis=0), cell.width, 0).pats
+
+
+
+# objectives
+
+def box_areas(cell: SquareCell) -> np.ndarray:
+    '''area of the bounding box of every candidate (as bounding_box, 1 x 1 without alive cells)'''
+
+    top, down, left, right = cell.spans()
+    return np.maximum(down - top + 1, 1) * np.maximum(right - left + 1, 1)
+
+
+# objective name -> value of every candidate of a cell
+OBJECTIVES: Dict[str, Callable[[SquareCell], np.ndarray]] = {
+    'population': lambda cell: cell.populations(),
+    'bounding box': box_areas,
+}
+
+
+def owned_mask(goal: Life, shape: Tuple[int, int], cord: Tuple[int, int]) -> np.ndarray:
+    '''
+    packed rows of the cells that the candidates of the rectangle shape at cord own
+
+    every cell of a predecessor is owned by exactly one rectangle of a partition of goal: the
+    inner cells of a candidate, and its outer rims where they lie outside of goal
+    '''
+
+    height, width = shape[0] + 2, shape[1] + 2
+    sides = rim_sides(goal, shape, cord)
+    rows = range(1 if 't' in sides else 0, height - 1 if 'd' in sides else height)
+    cols = range(1 if 'l' in sides else 0, width - 1 if 'r' in sides else width)
+    row = sum(1 << c for c in cols)
+    return np.array([row if r in rows else 0 for r in range(height)], dtype=np.uint64)
+
+
+class PartitionBounds:
+    '''
+    Lower bounds of an objective (see OBJECTIVES) for the candidates of a partition of goal
+
+    keys[i] = (shape, cord) of cells[i]. Every candidate has features that are combined when candidates
+    are merged: for 'population' the amount of its owned alive cells (see owned_mask), added up; for
+    'bounding box' the first row, -last row, first column and -last column of its alive cells (in the
+    coordinates of the predecessor), combined by their minimum. A predecessor is made of one candidate
+    per cell, so its objective is at least the value of some of its candidates combined with the least
+    features of all other cells (the least population, the cells alive in all candidates of a cell)
+    '''
+
+
+    def __init__(
+        self, goal: Life, objective: str,
+        keys: List[Tuple[Tuple[int, int], Tuple[int, int]]], cells: List[SquareCell]
+    ) -> None:
+        self.objective = objective
+        self.index = {key: i for i, key in enumerate(keys)}
+        if objective == 'population':
+            self.features = [cell.populations(owned_mask(goal, shape, cord)) for (shape, cord), cell in zip(keys, cells)]
+            self.least = [int(f.min()) if len(f) else 0 for f in self.features]
+        elif objective == 'bounding box':
+            self.features = [span_features(cell, cord) for (_, cord), cell in zip(keys, cells)]
+            self.least = [
+                span_features(SquareCell(np.bitwise_and.reduce(cell.rows, axis=0)[None], cell.width, cell.pos), cord)[0]
+                if len(cell) else np.full(4, NO_SPAN, dtype=np.int64)
+                for (_, cord), cell in zip(keys, cells)
+            ]
+        else:
+            raise Exception(f'No such objective \'{objective}\' is supported.')
+
+
+    def combine(self, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        return a + b if self.objective == 'population' else np.minimum(a, b)
+
+
+    def value(self, features: np.ndarray) -> np.ndarray:
+        if self.objective == 'population':
+            return features
+        return np.maximum(-features[:, 1] - features[:, 0] + 1, 1) * np.maximum(-features[:, 3] - features[:, 2] + 1, 1)
+
+
+    def rest(self, excluded: Sequence[int]) -> np.ndarray:
+        '''least features of all cells but the excluded ones, combined'''
+
+        if self.objective == 'population':
+            return np.int64(sum(self.least) - sum(self.least[i] for i in excluded))
+        others = [least for i, least in enumerate(self.least) if i not in excluded]
+        return np.min(others, axis=0) if others else np.full(4, NO_SPAN, dtype=np.int64)
+
+
+    def bounds(self) -> List[np.ndarray]:
+        '''lower bound of the objective of every predecessor that a candidate is part of, per cell'''
+        return [self.value(self.combine(f, self.rest([i]))) for i, f in enumerate(self.features)]
+
+
+
+def span_features(cell: SquareCell, cord: Tuple[int, int]) -> np.ndarray:
+    '''(n, 4) bounding box features of the candidates of cell at cord (see PartitionBounds)'''
+
+    top, down, left, right = cell.spans()
+    return np.stack((top + cord[0], -down - cord[0], left + cord[1], -right - cord[1]), axis=1)
+
+
+def bounded_merge(
+    bounds: PartitionBounds, keys: List[Tuple], pos: int, kind: str, limit: int, cut: List[int],
+    cells: List[SquareCell]
+) -> SquareCell:
+    '''
+    SquareCell.merge of the cells of keys that only builds the combinations whose lower bound of the objective
+    (see PartitionBounds) is at most limit, the least bound dropped is appended to cut
+
+    a quad also bounds the joins of its tops and downs (each with the least features of the other half)
+    '''
+
+    ids = [bounds.index[key] for key in keys]
+    def join(
+        method: Callable, a: Tuple[SquareCell, np.ndarray], b: Tuple[SquareCell, np.ndarray],
+        pos: int, excluded: List[int]
+    ) -> Tuple[SquareCell, np.ndarray]:
+        rest = bounds.rest(excluded)
+        kept = []
+        def keep(i: np.ndarray, j: np.ndarray) -> np.ndarray:
+            features = bounds.combine(a[1][i], b[1][j])
+            values = bounds.value(bounds.combine(features, rest))
+            mask = values <= limit
+            if not mask.all():
+                cut.append(int(values[~mask].min()))
+            kept.append(features[mask])
+            return mask
+        merged = method(a[0], b[0], pos, keep=keep)
+        return merged, np.concatenate(kept)
+
+    parts = [(cell, bounds.features[i]) for cell, i in zip(cells, ids)]
+    if kind == 'vertical':
+        return join(SquareCell.merge_vertical, parts[0], parts[1], pos, ids)[0]
+    if kind == 'horizontal':
+        return join(SquareCell.merge_horizontal, parts[0], parts[1], pos, ids)[0]
+    tops = join(SquareCell.merge_horizontal, parts[0], parts[1], pos, ids[:2])
+    downs = join(SquareCell.merge_horizontal, parts[2], parts[3], 2, ids[2:])
+    return join(SquareCell.merge_vertical, tops, downs, pos, ids)[0]
+
+
+
+def best_predecessors(
+    goal: Life, objective: str, k: int = 1,
+    pruned: Optional[List[int]] = None, orbits: bool = False, chunk: int = 4096,
+    sizes: Optional[List[int]] = None
+) -> List[Life]:
+    '''
+    the k predecessors of goal with the least objective (see OBJECTIVES), the least first
+
+    branch and bound: the merge levels drop every candidate whose lower bound of the objective exceeds
+    a limit (see pruned_children), so only predecessors up to the limit are built. All predecessors below
+    the least dropped bound are found; while these are fewer than k, the search is repeated with that
+    bound as the limit. The root is joined chunk by chunk (see root_chunks), only the k best
+    are kept
+    '''
+
+    if objective not in OBJECTIVES:
+        raise Exception(f'No such objective \'{objective}\' is supported.')
+    tree = SquareTree(goal.shape)
+    group = symmetries(goal)[1:]
+
+    # the leaves are the same in every pass, they are pruned once
+    start = {((1, 1), cord): leaf_cell(goal, cord, pos) for _, cord, pos in tree_parts(tree)[1]}
+    found = list(start.values())
+    arc_consistency(found, [cord for _, cord in start])
+    start = dict(zip(start, found))
+
+    limit = 0
+    while True:
+        cut: List[int] = []
+        if tree.type == 'leaf':
+            parts = [leaf_cell(goal, (0, 0), 0)]
+        else:
+            cells = pruned_children(
+                goal, tree, pruned, group=group,
+                objective=objective, limit=limit, cut=cut, start=start, sizes=sizes
+            )
+            parts = root_chunks(tree, cells, chunk)
+        least_cut = min(cut, default=inf)
+
+        best = SquareCell(np.zeros((0, goal.shape[0] + 2), dtype=np.uint64), goal.shape[1] + 2, 0)
+        values = np.zeros(0, dtype=np.int64)
+        below = 0
+        for part in parts:
+            if orbits:
+                part = part.select(orbit_representatives(part, group))
+            part_values = OBJECTIVES[objective](part)
+            below += int((part_values < least_cut).sum())
+            best = SquareCell(np.concatenate((best.rows, part.rows)), part.width, 0)
+            values = np.concatenate((values, part_values))
+            keep = np.argsort(values, kind='stable')[:k]
+            best, values = best.select(keep), values[keep]
+        if below >= k or least_cut == inf:
+            return best.pats
+        limit = least_cut
+
+
+# counting
+
+def quad_count(goal: Life) -> int:
+    '''
+    amount of predecessors of goal, like len(quad_gen(goal)) without building them
+
+    merges CountCell objects, which only keep the rims of the candidates where they border the
+    rest of goal, and how many candidates share each rim (pruned like quad_gen)
+    '''
+
+    if max(goal.shape) > MAX_COUNT_SIDE:
+        raise Exception(f'Counting is only supported for goals of at most {MAX_COUNT_SIDE}x{MAX_COUNT_SIDE} cells.')
+    tree = SquareTree(goal.shape)
+    if tree.type == 'leaf':
+        return CountCell.leaf(leaf_kind(goal, (0, 0)), 0, '').total
+    return CountCell.merge(0, tree.type, *pruned_children(goal, tree, counting=True), sides='').total
+
+
+def is_garden_of_eden(goal: Life) -> bool:
+    '''True if goal has no predecessor'''
+    return quad_count(goal) == 0
+
+
+
+# streaming
+
+def root_chunks(tree: SquareTree, cells: List[SquareCell], chunk: int) -> Iterator[SquareCell]:
+    '''the last merge of quad_gen, of the children cells of the root, for chunk candidates of the first one at a time'''
+
+    first = cells[0]
+    if tree.type == 'quad':
+        downs = SquareCell.merge_horizontal(cells[2], cells[3], 2)
+    for start in range(0, len(first), chunk):
+        part = SquareCell(first.rows[start : start+chunk], first.width, first.pos)
+        if tree.type == 'vertical':
+            yield SquareCell.merge_vertical(part, cells[1], 0)
+        else:
+            merged = SquareCell.merge_horizontal(part, cells[1], 0)
+            yield SquareCell.merge_vertical(merged, downs, 0) if tree.type == 'quad' else merged
+
+
+def iter_predecessors(goal: Life, chunk: int = 4096, sizes: Optional[List[int]] = None) -> Iterator[Life]:
+    '''
+    like quad_gen, but yields the predecessors lazily
+
+    everything below the root is merged as usual, the final join of the root is done for
+    chunk candidates of its top left (or top) cell at a time (see root_chunks), so at most
+    the candidates of one chunk are unpacked into Life arrays at once
+    (sizes as in pruned_children)
+    '''
+
+    tree = SquareTree(goal.shape)
+    if tree.type == 'leaf':
+        yield from leaf_cell(goal, (0, 0), 0).pats
+        return
+
+    for merged in root_chunks(tree, pruned_children(goal, tree, sizes=sizes), chunk):
+        yield from merged.pats
+
+
+
+# parallel search
+
+def _subtree_task(goal: Life, shape: Tuple[int, int], cord: Tuple[int, int], pos: int) -> bytes:
+    return tree_merge(goal, SquareTree(shape), cord, pos).to_bytes()
+
+
+def _join_task(kind: str, first: bytes, second: bytes, pos: int) -> bytes:
+    c1, c2 = SquareCell.from_bytes(first), SquareCell.from_bytes(second)
+    if kind == 'horizontal':
+        return SquareCell.merge_horizontal(c1, c2, pos).to_bytes()
+    return SquareCell.merge_vertical(c1, c2, pos).to_bytes()
+
+
+def parallel_join(
+    pool: ProcessPoolExecutor, workers: int, kind: str,
+    c1: SquareCell, c2: SquareCell, pos: int
+) -> SquareCell:
+    '''merge_horizontal / merge_vertical with the candidates of c1 split into one chunk per worker'''
+
+    if len(c1) < PARALLEL_JOIN_MIN:
+        return _join_local(kind, c1, c2, pos)
+    second = c2.to_bytes()
+    futures = [
+        pool.submit(_join_task, kind, SquareCell(chunk, c1.width, c1.pos).to_bytes(), second, pos)
+        for chunk in np.array_split(c1.rows, workers)
+    ]
+    parts = [SquareCell.from_bytes(f.result()) for f in futures]
+    return SquareCell(np.concatenate([p.rows for p in parts]), parts[0].width, pos)
+
+
+def _join_local(kind: str, c1: SquareCell, c2: SquareCell, pos: int) -> SquareCell:
+    if kind == 'horizontal':
+        return SquareCell.merge_horizontal(c1, c2, pos)
+    return SquareCell.merge_vertical(c1, c2, pos)
+
+
+def parallel_tree_merge(pool: ProcessPoolExecutor, workers: int, goal: Life, tree: SquareTree) -> SquareCell:
+    '''
+    tree_merge spread over a process pool
+
+    the tree is split top down until there are at least 2 subtrees per worker, these subtrees
+    are merged in the pool, and the remaining (largest) joins above them are split into one
+    chunk of left/top candidates per worker; cells travel as SquareCell.to_bytes
+    '''
+
+    # choose the subtrees to hand out
+    frontier = [(tree, (0, 0), 0)]
+    while len(frontier) < 2 * workers and any(t.type != 'leaf' for t, _, _ in frontier):
+        frontier = [
+            child
+            for twig, cord, pos in frontier
+            for child in ([(twig, cord, pos)] if twig.type == 'leaf' else twig_children(twig, cord))
+        ]
+    futures = {
+        (cord, twig.shape): pool.submit(_subtree_task, goal, twig.shape, cord, pos)
+        for twig, cord, pos in frontier
+    }
+
+    def collect(twig: SquareTree, cord: Tuple[int, int], pos: int) -> SquareCell:
+        if (cord, twig.shape) in futures:
+            return SquareCell.from_bytes(futures[(cord, twig.shape)].result())
+        cells = [collect(*child) for child in twig_children(twig, cord)]
+        if twig.type == 'vertical':
+            return parallel_join(pool, workers, 'vertical', cells[0], cells[1], pos)
+        tops = parallel_join(pool, workers, 'horizontal', cells[0], cells[1], pos)
         if twig.type == 'horizontal':
-            return SquareCell.merge(pos, 'horizontal', top_left, top_right)
-        
-        down_left = tree_merge(twig.dl, (cord[0] + off_height, cord[1]), 0)
-        down_right = tree_merge(twig.dr, (cord[0] + off_height, cord[1] + off_width), 1)
-        return SquareCell.merge(pos, 'quad', top_left, top_right, down_left, down_right)
-        
-
-    result = tree_merge(tree, (0, 0), 0)
-    return result.pats
\ No newline at end of file
+            return tops
+        downs = parallel_join(pool, workers, 'horizontal', cells[2], cells[3], 2)
+        return parallel_join(pool, workers, 'vertical', tops, downs, pos)
+
+    return collect(tree, (0, 0), 0)
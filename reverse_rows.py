@@ -0,0 +1,161 @@
+import numpy as np
+from functools import lru_cache
+
+from gol_tools import *
+
+from typing import Iterator, List, Tuple
+Life = np.ndarray
+
+
+
+@lru_cache(maxsize=None)
+def window_tables() -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    (off, on) lookup tables of the 3x3 windows whose centre is off / on after one generation
+
+    a window is coded in 9 bits, bit 3 * i + k is the cell in row i and column k,
+    built from single_cell_predecessors()['on']
+    '''
+
+    pats = np.array(single_cell_predecessors()['on'], dtype=np.int64).reshape(-1, 9)
+    on = np.zeros(512, dtype=bool)
+    on[(pats << np.arange(9)).sum(axis=1)] = True
+    on.flags.writeable = False
+    off = ~on
+    off.flags.writeable = False
+    return off, on
+
+
+def windows(rows: np.ndarray, width: int) -> np.ndarray:
+    '''(n, width) array, entry c holds bits c - 1, c, c + 1 of the packed rows (column -1 is dead)'''
+    return (((rows[:, None] << np.uint64(1)) >> np.arange(width, dtype=np.uint64)) & np.uint64(7)).astype(np.uint16)
+
+
+
+def sweep_row(
+    up: np.ndarray, mid: np.ndarray, goal_row: Life, down_free: bool
+) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    all rows down such that up, mid, down step to goal_row in the row of mid
+
+    rows are packed into integers (bit c = column c, columns outside are dead), down is all dead
+    unless down_free. It is chosen column by column and every goal cell is checked as soon as its
+    3x3 window is known.
+    Returns for every solution the index into up / mid it continues and its down row
+    '''
+
+    tables = window_tables()
+    width = len(goal_row)
+    # column c of up and mid around every column, in the low 6 bits of a window code
+    upper = np.ascontiguousarray((windows(up, width) | (windows(mid, width) << np.uint16(3))).T)
+    index = np.arange(len(up), dtype=np.int32)
+    down = np.zeros(len(up), dtype=np.uint32)
+    # bits col - 2, col - 1, col of down, as the high 3 bits of a window code
+    tail = np.zeros(len(up), dtype=np.uint16)
+    high = np.uint16(4 << 6)
+    for col in range(width + 1):
+        tail = (tail >> np.uint16(1)) & np.uint16(7 << 6)
+        if col == 0:
+            if down_free:
+                index = np.concatenate((index, index))
+                down = np.concatenate((down, down | np.uint32(1)))
+                tail = np.concatenate((tail, tail | high))
+            continue
+        table = tables[goal_row[col - 1]]
+        codes = upper[col - 1][index] | tail
+        if col < width and down_free:
+            # down[col] dead or alive, the goal cell in column col - 1 decides which ones survive
+            dead, alive = table[codes], table[codes | high]
+            bit = np.uint32(1 << col)
+            index = np.concatenate((index[dead], index[alive]))
+            down = np.concatenate((down[dead], down[alive] | bit))
+            tail = np.concatenate((tail[dead], tail[alive] | high))
+        else:
+            keep = table[codes]
+            index, down, tail = index[keep], down[keep], tail[keep]
+    return index, down
+
+
+
+def sweep(goal: Life) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    '''
+    row by row search over the predecessors of goal ('Hard Edges', as test_if_pre)
+
+    the state after row r of the predecessor X is its rows (X[r], X[r + 1]), packed into one
+    integer (X[r + 1] in the high bits); equal states are merged, so a step only holds the states
+    of one row. The first step has every possible X[0] (below the dead row X[-1]), then yields
+    per row of X: the distinct states, and for every transition the index of the state it
+    comes from and of the state it leads to
+    '''
+
+    padded = pad(goal)
+    rows, width = padded.shape
+    if 2 * width > 64:
+        raise Exception('Row sweeping is limited to 30 columns.')
+    mask = np.uint64((1 << width) - 1)
+    states = np.arange(1 << width, dtype=np.uint64) << np.uint64(width)
+    for r in range(rows):
+        up, mid = states & mask, states >> np.uint64(width)
+        index, down = sweep_row(up, mid, padded[r], r < rows - 1)
+        states, inverse = np.unique(mid[index] | (down << np.uint64(width)), return_inverse=True)
+        yield states, index, inverse.reshape(-1)
+
+
+
+def narrow(goal: Life) -> Tuple[Life, bool]:
+    '''goal or its transpose, whichever has fewer columns (Life is symmetric under transposing)'''
+
+    if goal.shape[1] > goal.shape[0]:
+        return goal.T, True
+    return goal, False
+
+
+
+def row_count(goal: Life) -> int:
+    '''amount of predecessors of goal, only the multiplicity of every state of the current row is kept'''
+
+    counts = None
+    for states, index, inverse in sweep(narrow(goal)[0]):
+        merged = np.zeros(len(states), dtype=object)
+        np.add.at(merged, inverse, np.ones(len(index), dtype=object) if counts is None else counts[index])
+        counts = merged
+    return int(counts.sum())
+
+
+
+def iter_row_predecessors(goal: Life) -> Iterator[Life]:
+    '''
+    yields all predecessors of goal, found with the row sweep
+
+    the transitions between the states of every row are kept (not the predecessors), then every
+    path back from a final state spells out one predecessor
+    '''
+
+    narrowed, transposed = narrow(goal)
+    height, width = narrowed.shape[0] + 2, narrowed.shape[1] + 2
+    mask = np.uint64((1 << width) - 1)
+
+    # per row: states, and the states of the row before leading to each of them
+    layers = []
+    for states, index, inverse in sweep(narrowed):
+        order = np.argsort(inverse, kind='stable')
+        starts = np.searchsorted(inverse[order], np.arange(len(states) + 1))
+        layers.append((states & mask, index[order], starts))
+
+    bits = np.arange(width, dtype=np.uint64)
+    stack = [(height - 1, s, ()) for s in range(len(layers[-1][0]) - 1, -1, -1)]
+    while stack:
+        r, s, below = stack.pop()
+        lows, parents, starts = layers[r]
+        found = (lows[s],) + below
+        if r == 0:
+            life = ((np.array(found, dtype=np.uint64)[:, None] >> bits) & np.uint64(1)).astype(np.int8)
+            yield life.T.copy() if transposed else life
+        else:
+            stack += [(r - 1, p, found) for p in parents[starts[s] : starts[s + 1]][::-1]]
+
+
+
+def row_gen(goal: Life) -> List[Life]:
+    '''all predecessors of goal, found with the row sweep'''
+    return list(iter_row_predecessors(goal))
@@ -0,0 +1,121 @@
+import numpy as np
+from itertools import combinations
+from functools import lru_cache
+
+from gol_tools import *
+from sat_solver import Solver
+
+from typing import List, Optional, Tuple
+Life = np.ndarray
+
+
+
+@lru_cache(maxsize=None)
+def cell_clauses(alive: bool, n_near: int) -> List[Tuple[int, ...]]:
+    '''
+    clauses forcing the successor state of a cell with n_near neighbours
+
+    literal +-(i + 1) stands for neighbour i, +-(n_near + 1) for the cell itself
+    alive:      2 <= count <= 3 and (count == 3 or me)
+    not alive:  count != 3 and (count != 2 or not me)
+    every clause forbids one set of neighbours from being the alive ones (all others in the clause),
+    so unit propagation already decides a cell once enough of its neighbours are known
+    '''
+
+    near = range(1, n_near + 1)
+    me = n_near + 1
+    clauses = []
+    if alive:
+        clauses += [tuple(-a for a in four) for four in combinations(near, 4)]
+        clauses += list(combinations(near, n_near - 1)) if n_near >= 2 else [()]
+    else:
+        clauses += [
+            tuple(-a for a in three) + tuple(b for b in near if b not in three)
+            for three in combinations(near, 3)
+        ]
+    for two in combinations(near, 2):
+        clauses.append(tuple(-a for a in two) + tuple(b for b in near if b not in two) + (me if alive else -me,))
+    return clauses
+
+
+
+def predecessor_cnf(goal: Life) -> List[List[int]]:
+    '''
+    CNF of 'next_gen(X) == pad(goal)' with 'Hard Edges' (the semantics of test_if_pre)
+
+    X is (rows + 2) x (cols + 2), cell (r, c) of X is variable r * (cols + 2) + c + 1
+    '''
+
+    padded = pad(goal)
+    rows, cols = padded.shape
+    clauses = []
+    for r in range(rows):
+        for c in range(cols):
+            near = [
+                nr * cols + nc + 1
+                for nr in range(max(0, r - 1), min(rows, r + 2))
+                for nc in range(max(0, c - 1), min(cols, c + 2))
+                if (nr, nc) != (r, c)
+            ]
+            cell = near + [r * cols + c + 1]
+            clauses += [
+                [cell[lit - 1] if lit > 0 else -cell[-lit - 1] for lit in clause]
+                for clause in cell_clauses(bool(padded[r, c]), len(near))
+            ]
+    return clauses
+
+
+def predecessor_solver(goal: Life, save_phases: bool = True) -> Solver:
+    '''Solver loaded with predecessor_cnf(goal)'''
+
+    solver = Solver((goal.shape[0] + 2) * (goal.shape[1] + 2), save_phases=save_phases)
+    for clause in predecessor_cnf(goal):
+        if not solver.add_clause(clause):
+            break
+    return solver
+
+
+def solver_life(solver: Solver, shape: Tuple[int, int]) -> Life:
+    '''the predecessor in the model of the last solve'''
+
+    return np.array(solver.model()[1:], dtype=np.int8).reshape(shape[0] + 2, shape[1] + 2)
+
+
+
+def sat_gen(goal: Life, amount: Optional[int] = 1) -> List[Life]:
+    '''
+    up to amount predecessors of goal (all of them for amount = None), found with a SAT solver
+
+    unlike quad_gen the size of goal is not limited, every found predecessor is excluded
+    with a clause before the next search
+    '''
+
+    solver = predecessor_solver(goal)
+    found = []
+    while (amount is None or len(found) < amount) and solver.solve():
+        life = solver_life(solver, goal.shape)
+        found.append(life)
+        solver.add_clause([-(i + 1) if cell else i + 1 for i, cell in enumerate(life.flat)])
+    return found
+
+
+
+def sat_min_population(goal: Life, max_conflicts: Optional[int] = None) -> List[Life]:
+    '''
+    a predecessor of goal with the fewest alive cells ([] if there is none)
+
+    after every found predecessor the population is bounded below it, until no predecessor is left.
+    Proving that last step can take long, with max_conflicts the search stops after that many
+    conflicts and returns the fewest found so far.
+    Decisions always try dead cells first (no phase saving), which starts off with sparse predecessors.
+    '''
+
+    solver = predecessor_solver(goal, save_phases=False)
+    cells = range(1, solver.n_vars + 1)
+    limit = None if max_conflicts is None else solver.conflicts + max_conflicts
+    best = None
+    while solver.solve(None if limit is None else limit - solver.conflicts):
+        best = solver_life(solver, goal.shape)
+        if not solver.at_most(cells, int(best.sum()) - 1):
+            break
+    return [] if best is None else [best]
@@ -0,0 +1,232 @@
+import numpy as np
+import atexit
+import multiprocessing
+import os
+import queue
+import signal
+import time
+
+from reverse_quad_gen import quad_gen, iter_predecessors, quad_count
+from reverse_sat import sat_gen, sat_min_population
+from reverse_rows import iter_row_predecessors
+from reverse_generations import iter_ancestors
+from reverse_cache import PredecessorCache, CACHE_PATH
+
+from typing import Any, Iterator, List, Optional, Tuple
+Life = np.ndarray
+
+
+# 'SAT: Find Many' stops after this many predecessors,
+# 'SAT: Fewest Alive Cells' gives up proving after this many conflicts
+SAT_AMOUNT = 64
+SAT_MAX_CONFLICTS = 2000
+# reversing more than one generation searches at most this many patterns per generation
+GENERATION_BEAM = 256
+# the 'Quadtree: Fewest Alive Cells' and 'Quadtree: Smallest Bounding Box' backends return this many predecessors
+BEST_AMOUNT = 16
+
+# this backend counts the predecessors (see quad_count) instead of searching them
+COUNT_BACKEND = 'Count'
+
+# found predecessors are sent in batches of at most this many, or after this many seconds
+BATCH_SIZE = 256
+BATCH_SECONDS = 0.1
+
+
+
+def reverse_stream(
+    goal: Life, backend: str, generations: int = 1, workers: int = 1,
+    cache_path: str = CACHE_PATH, sizes: Optional[List[int]] = None
+) -> Iterator[Life]:
+    '''
+    the predecessors of goal found by a backend (as listed in the Reverse Backend menu)
+
+    generations > 1 searches ancestors with the quadtree (only for its backends), complete predecessor
+    sets are stored in the cache at cache_path once they are exhausted.
+    The candidates left after every pass of the quadtree merges are appended to sizes
+    '''
+
+    if generations > 1 and not backend.startswith('Quadtree'):
+        raise Exception(f"The backend '{backend}' only reverses one generation.")
+    cache = PredecessorCache(cache_path)
+    if backend == 'SAT: Find One':
+        yield from sat_gen(goal, 1)
+    elif backend == 'SAT: Find Many':
+        yield from sat_gen(goal, SAT_AMOUNT)
+    elif backend == 'SAT: Fewest Alive Cells':
+        yield from sat_min_population(goal, SAT_MAX_CONFLICTS)
+    elif backend == 'Row Sweep':
+        yield from cache.storing(goal, iter_row_predecessors(goal))
+    elif generations > 1:
+        yield from iter_ancestors(goal, generations, beam=GENERATION_BEAM)
+    elif backend == 'Quadtree: Fewest Alive Cells':
+        yield from quad_gen(goal, objective='population', k=BEST_AMOUNT, sizes=sizes)
+    elif backend == 'Quadtree: Smallest Bounding Box':
+        yield from quad_gen(goal, objective='bounding box', k=BEST_AMOUNT, sizes=sizes)
+    elif backend == 'Quadtree: One per Symmetry':
+        yield from quad_gen(goal, workers=workers, orbits=True, sizes=sizes)
+    elif workers > 1:
+        lifes = quad_gen(goal, workers=workers)
+        cache.put(goal, lifes)
+        yield from lifes
+    else:
+        yield from cache.storing(goal, iter_predecessors(goal, sizes=sizes))
+
+
+
+class Reported(list):
+    '''list that also puts every appended value on a queue, as (kind, index, value)'''
+
+
+    def __init__(self, messages: Any, kind: str) -> None:
+        super().__init__()
+        self.messages = messages
+        self.kind = kind
+
+
+    def append(self, value: Any) -> None:
+        super().append(value)
+        self.messages.put((self.kind, len(self) - 1, value))
+
+
+
+def run_search(
+    messages: Any, wanted: Any, goal: Life, backend: str,
+    generations: int, workers: int, cache_path: str
+) -> None:
+    '''
+    body of the process of a ReverseJob
+
+    puts ('level', pass, candidates) per merge pass and ('lifes', [predecessors]) batches on messages,
+    at last ('done', amount) or ('error', message). No more predecessors are searched than wanted.value.
+    COUNT_BACKEND puts ('count', amount) instead of the batches
+    '''
+
+    # own process group, so a cancel also stops the processes of a worker pool (see ReverseJob.cancel)
+    if hasattr(os, 'setpgrp'):
+        os.setpgrp()
+    parent = os.getppid()
+    try:
+        if backend == COUNT_BACKEND:
+            messages.put(('count', quad_count(goal)))
+            messages.put(('done', 0))
+            return
+        sent = 0
+        batch: List[Life] = []
+        flushed = time.monotonic()
+        for life in reverse_stream(goal, backend, generations, workers, cache_path, Reported(messages, 'level')):
+            batch.append(life)
+            if len(batch) >= BATCH_SIZE or sent + len(batch) >= wanted.value or time.monotonic() - flushed > BATCH_SECONDS:
+                messages.put(('lifes', batch))
+                sent += len(batch)
+                batch = []
+                flushed = time.monotonic()
+            while sent >= wanted.value:
+                # nobody is left to ask for more
+                if os.getppid() != parent:
+                    return
+                time.sleep(BATCH_SECONDS)
+        if batch:
+            messages.put(('lifes', batch))
+            sent += len(batch)
+        messages.put(('done', sent))
+    except Exception as e:
+        messages.put(('error', str(e)))
+
+
+
+class ReverseJob:
+    '''
+    A reverse search (see reverse_stream) running in a process of its own
+
+    found predecessors come back in batches, but only as many as were asked for (see request), so
+    an endless stream is not searched further than it is looked at. poll returns the messages that
+    arrived so far (see run_search), cancel stops the search, the found predecessors stay valid.
+    elapsed only counts the time the search ran, not the time it waited for a request.
+    A job still running when the interpreter exits is cancelled (its process does not end by itself)
+    '''
+
+
+    def __init__(
+        self, goal: Life, backend: str, generations: int = 1, workers: int = 1,
+        cache_path: str = CACHE_PATH, wanted: int = BATCH_SIZE
+    ) -> None:
+        self.backend = backend
+        context = multiprocessing.get_context('spawn')
+        self.messages = context.Queue()
+        self.wanted = context.Value('q', wanted)
+        self.process = context.Process(
+            target=run_search,
+            args=(self.messages, self.wanted, goal, backend, generations, workers, cache_path)
+        )
+        self.received = 0
+        self.searched = 0.0
+        self.clock = time.monotonic()
+        self.finished = False
+        self.process.start()
+        atexit.register(self.cancel)
+
+
+    @property
+    def elapsed(self) -> float:
+        '''seconds searched, the clock stands while all wanted predecessors were received'''
+
+        self.tick()
+        return self.searched
+
+
+    def tick(self) -> None:
+        now = time.monotonic()
+        if self.received < self.wanted.value:
+            self.searched += now - self.clock
+        self.clock = now
+
+
+    @property
+    def running(self) -> bool:
+        return not self.finished
+
+
+    def request(self, amount: int) -> None:
+        '''search on until amount predecessors are found in total'''
+
+        self.tick()
+        with self.wanted.get_lock():
+            self.wanted.value = max(self.wanted.value, amount)
+
+
+    def poll(self) -> List[Tuple]:
+        '''all messages waiting, the job is finished after a 'done' or 'error' one (or if its process died)'''
+
+        self.tick()
+        found = []
+        while True:
+            try:
+                found.append(self.messages.get_nowait())
+            except queue.Empty:
+                break
+        self.received += sum(len(message[1]) for message in found if message[0] == 'lifes')
+        if any(message[0] in ('done', 'error') for message in found):
+            self.finish()
+            self.process.join()
+        elif not found and not self.process.is_alive() and not self.finished:
+            self.finish()
+            found.append(('error', f'The search stopped unexpectedly (exit code {self.process.exitcode}).'))
+        return found
+
+
+    def finish(self) -> None:
+        self.finished = True
+        atexit.unregister(self.cancel)
+
+
+    def cancel(self) -> None:
+        if self.finished:
+            return
+        self.finish()
+        if self.process.is_alive():
+            try:
+                os.killpg(self.process.pid, signal.SIGTERM)
+            except (AttributeError, ProcessLookupError, PermissionError):
+                self.process.terminate()
+        self.process.join()
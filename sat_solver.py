@@ -0,0 +1,316 @@
+from heapq import heapify, heappush, heappop
+
+from typing import List, Optional, Sequence
+Clause = List[int]
+
+
+
+def luby(i: int) -> int:
+    '''i-th element (from 0) of the luby sequence 1 1 2 1 1 2 4 1 1 2 ...'''
+
+    size, power = 1, 1
+    while size < i + 1:
+        size, power = 2 * size + 1, 2 * power
+    while size - 1 != i:
+        size, power = (size - 1) // 2, power // 2
+        i %= size
+    return power
+
+
+
+class Solver:
+    '''
+    Small CDCL SAT solver (pure Python)
+
+    literals are ints: v > 0 is variable v, -v its negation (variables 1..n_vars).
+    Conflict driven clause learning with 2 watched literals, VSIDS decisions,
+    phase saving (unset variables are tried False first, with save_phases = False always)
+    and luby restarts.
+
+    Besides clauses it knows one cardinality constraint, 'at most bound of the given
+    variables are true' (see at_most), so a population can be bounded without encoding
+    a counter into clauses. Clauses and tighter bounds can be added between solves,
+    everything learned so far stays valid.
+    '''
+
+
+    def __init__(self, n_vars: int, save_phases: bool = True) -> None:
+        self.n_vars = n_vars
+        self.save_phases = save_phases
+        # indexed by literal: val[-v] lives at the end of the list (python negative indexing)
+        self.val = [0] * (2 * n_vars + 1)
+        self.watches: List[List[Clause]] = [[] for _ in range(2 * n_vars + 1)]
+        self.level = [0] * (n_vars + 1)
+        self.reason: List[Optional[Sequence[int]]] = [None] * (n_vars + 1)
+        self.phase = [-1] * (n_vars + 1)
+        self.activity = [0.0] * (n_vars + 1)
+        self.var_inc = 1.0
+        self.heap = [(0.0, v) for v in range(1, n_vars + 1)]
+        self.trail: List[int] = []
+        self.trail_lim: List[int] = []
+        self.qhead = 0
+        self.ok = True
+        self.conflicts = 0
+
+        # cardinality constraint
+        self.counted = [False] * (n_vars + 1)
+        self.count_vars: List[int] = []
+        self.bound: Optional[int] = None
+        self.count_trues: List[int] = []
+
+
+    @property
+    def decision_level(self) -> int:
+        return len(self.trail_lim)
+
+
+    def value(self, lit: int) -> int:
+        '''1 = true, -1 = false, 0 = unassigned'''
+        return self.val[lit]
+
+
+    def model(self) -> List[bool]:
+        '''truth value of every variable (index 0 unused), valid right after solve returned True'''
+        return [False] + [self.val[v] == 1 for v in range(1, self.n_vars + 1)]
+
+
+    def assign(self, lit: int, reason: Optional[Sequence[int]]) -> None:
+        v = abs(lit)
+        self.val[lit], self.val[-lit] = 1, -1
+        self.level[v] = self.decision_level
+        self.reason[v] = reason
+        self.trail.append(lit)
+        if lit > 0 and self.counted[v]:
+            self.count_trues.append(v)
+
+
+    def backtrack(self, level: int) -> None:
+        if self.decision_level <= level:
+            return
+        lim = self.trail_lim[level]
+        val, heap, activity = self.val, self.heap, self.activity
+        for lit in reversed(self.trail[lim:]):
+            v = abs(lit)
+            val[lit] = val[-lit] = 0
+            if self.save_phases:
+                self.phase[v] = 1 if lit > 0 else -1
+            if lit > 0 and self.counted[v]:
+                self.count_trues.pop()
+            heappush(heap, (-activity[v], v))
+        del self.trail[lim:]
+        del self.trail_lim[level:]
+        self.qhead = lim
+        if len(heap) > 8 * self.n_vars:
+            self.heap = [(-activity[v], v) for v in range(1, self.n_vars + 1) if not val[v]]
+            heapify(self.heap)
+
+
+
+    def add_clause(self, lits: Sequence[int]) -> bool:
+        '''add a clause (drops back to decision level 0), returns False if the formula became unsatisfiable'''
+
+        if not self.ok:
+            return False
+        self.backtrack(0)
+        clause = list(dict.fromkeys(lits))
+        if len({abs(lit) for lit in clause}) < len(clause):
+            return True
+        if self.trail:
+            val = self.val
+            if any(val[lit] == 1 for lit in clause):
+                return True
+            clause = [lit for lit in clause if not val[lit]]
+        if not clause:
+            self.ok = False
+        elif len(clause) == 1:
+            self.assign(clause[0], None)
+            self.ok = self.propagate() is None
+        else:
+            self.watches[clause[0]].append(clause)
+            self.watches[clause[1]].append(clause)
+        return self.ok
+
+
+    def at_most(self, variables: Sequence[int], bound: int) -> bool:
+        '''
+        at most bound of variables are true from now on (replaces an earlier cardinality constraint)
+
+        only tightening an existing bound on the same variables keeps the learned clauses valid
+        '''
+
+        if not self.ok:
+            return False
+        self.backtrack(0)
+        for v in self.count_vars:
+            self.counted[v] = False
+        self.count_vars = list(variables)
+        for v in self.count_vars:
+            self.counted[v] = True
+        self.bound = bound
+        self.count_trues = [lit for lit in self.trail if lit > 0 and self.counted[lit]]
+        if len(self.count_trues) > bound:
+            self.ok = False
+        elif len(self.count_trues) == bound:
+            for v in self.count_vars:
+                if not self.val[v]:
+                    self.assign(-v, None)
+            self.ok = self.propagate() is None
+        return self.ok
+
+
+
+    def propagate(self) -> Optional[Sequence[int]]:
+        '''unit propagation of the trail, returns a conflicting clause (all literals false) or None'''
+
+        val, watches, trail = self.val, self.watches, self.trail
+        while self.qhead < len(trail):
+            p = trail[self.qhead]
+            self.qhead += 1
+            false_lit = -p
+
+            if p > 0 and self.counted[p] and self.bound is not None:
+                trues = self.count_trues
+                if len(trues) > self.bound:
+                    self.qhead = len(trail)
+                    return [-t for t in trues[:self.bound + 1]]
+                if len(trues) == self.bound and trues[-1] == p:
+                    reason = tuple(-t for t in trues)
+                    for v in self.count_vars:
+                        if not val[v]:
+                            self.assign(-v, reason)
+
+            ws = watches[false_lit]
+            watches[false_lit] = kept = []
+            for i, clause in enumerate(ws):
+                if clause[0] == false_lit:
+                    clause[0], clause[1] = clause[1], false_lit
+                first = clause[0]
+                if val[first] == 1:
+                    kept.append(clause)
+                    continue
+                for k in range(2, len(clause)):
+                    lit = clause[k]
+                    if val[lit] != -1:
+                        clause[1], clause[k] = lit, false_lit
+                        watches[lit].append(clause)
+                        break
+                else:
+                    kept.append(clause)
+                    if val[first] == -1:
+                        kept.extend(ws[i + 1:])
+                        self.qhead = len(trail)
+                        return clause
+                    self.assign(first, clause)
+        return None
+
+
+    def analyze(self, conflict: Sequence[int]) -> Clause:
+        '''first UIP learned clause, the asserting literal first and a literal of the backjump level second'''
+
+        seen = set()
+        learnt = [0]
+        level, reason, trail = self.level, self.reason, self.trail
+        current = self.decision_level
+        pending = 0
+        implied = 0
+        clause = conflict
+        index = len(trail) - 1
+        while True:
+            for lit in clause:
+                v = abs(lit)
+                if v != implied and v not in seen and level[v] > 0:
+                    seen.add(v)
+                    self.bump(v)
+                    if level[v] == current:
+                        pending += 1
+                    else:
+                        learnt.append(lit)
+            while abs(trail[index]) not in seen:
+                index -= 1
+            p = trail[index]
+            index -= 1
+            implied = abs(p)
+            pending -= 1
+            if pending == 0:
+                break
+            clause = reason[implied]
+        learnt[0] = -p
+
+        # drop literals whose reason only holds other literals of the clause (or level 0 ones)
+        kept = {abs(lit) for lit in learnt}
+        learnt[1:] = [
+            lit for lit in learnt[1:]
+            if reason[abs(lit)] is None
+            or any(abs(q) not in kept and level[abs(q)] > 0 for q in reason[abs(lit)])
+        ]
+
+        if len(learnt) > 2:
+            top = max(range(1, len(learnt)), key=lambda i: level[abs(learnt[i])])
+            learnt[1], learnt[top] = learnt[top], learnt[1]
+        return learnt
+
+
+    def bump(self, v: int) -> None:
+        self.activity[v] += self.var_inc
+        if self.activity[v] > 1e100:
+            self.activity = [a * 1e-100 for a in self.activity]
+            self.var_inc *= 1e-100
+        if not self.val[v]:
+            heappush(self.heap, (-self.activity[v], v))
+
+
+    def pick(self) -> int:
+        '''unassigned variable of highest activity, 0 if everything is assigned'''
+
+        heap, val = self.heap, self.val
+        while heap:
+            v = heappop(heap)[1]
+            if not val[v]:
+                return v
+        return 0
+
+
+
+    def solve(self, max_conflicts: Optional[int] = None) -> Optional[bool]:
+        '''
+        search for a model, afterwards read it with model() or value()
+
+        returns None if max_conflicts conflicts passed without an answer
+        '''
+
+        if not self.ok:
+            return False
+        limit = None if max_conflicts is None else self.conflicts + max_conflicts
+        self.backtrack(0)
+        restarts = 0
+        budget = 100 * luby(restarts)
+        while True:
+            conflict = self.propagate()
+            if conflict is not None:
+                self.conflicts += 1
+                if self.decision_level == 0:
+                    self.ok = False
+                    return False
+                learnt = self.analyze(conflict)
+                self.backtrack(self.level[abs(learnt[1])] if len(learnt) > 1 else 0)
+                if len(learnt) == 1:
+                    self.assign(learnt[0], None)
+                else:
+                    self.watches[learnt[0]].append(learnt)
+                    self.watches[learnt[1]].append(learnt)
+                    self.assign(learnt[0], learnt)
+                self.var_inc /= 0.95
+                budget -= 1
+                if limit is not None and self.conflicts >= limit:
+                    return None
+            else:
+                if budget <= 0:
+                    restarts += 1
+                    budget = 100 * luby(restarts)
+                    self.backtrack(0)
+                    continue
+                v = self.pick()
+                if not v:
+                    return True
+                self.trail_lim.append(len(self.trail))
+                self.assign(v * self.phase[v], None)
@@ -3,39 +3,213 @@ from __future__ import annotations
 from gol_tools import *
 
 import numpy as np
-from typing import Iterable, Optional
+from collections import deque
+from functools import lru_cache
+from itertools import combinations
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+
+
+def pack_rows(pats: Iterable[Life]) -> np.ndarray:
+    '''(n, height) np.uint64 array, bit c of a row is the cell in column c'''
+
+    stack = np.array(list(pats), dtype=np.uint64)
+    if stack.size == 0:
+        return np.zeros((0, stack.shape[1] if stack.ndim == 3 else 0), dtype=np.uint64)
+    return (stack << np.arange(stack.shape[2], dtype=np.uint64)).sum(axis=2, dtype=np.uint64)
+
+
+def unpack_rows(rows: np.ndarray, width: int) -> np.ndarray:
+    '''(n, height, width) np.int8 stack of the patterns packed by pack_rows'''
+
+    return ((rows[:, :, None] >> np.arange(width, dtype=np.uint64)) & np.uint64(1)).astype(np.int8)
+
+
+def row_bits(rows: np.ndarray, width: int) -> np.ndarray:
+    '''(n, height, width) np.uint8 stack of the packed rows, like unpack_rows but 1 byte per cell'''
+
+    as_bytes = rows.astype('<u4').reshape(-1).view(np.uint8)
+    return np.unpackbits(as_bytes, bitorder='little').reshape(*rows.shape, 32)[..., :width]
+
+
+def bits_rows(bits: np.ndarray) -> np.ndarray:
+    '''packed rows of a stack of row_bits (at most 32 wide)'''
+
+    padded = np.zeros((*bits.shape[:-1], 32), dtype=np.uint8)
+    padded[..., :bits.shape[-1]] = bits
+    return np.packbits(padded.reshape(-1), bitorder='little').view('<u4').reshape(bits.shape[:-1]).astype(np.uint64)
+
+
+# alive cells of every byte value
+POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+# first / last alive row or column of a candidate without alive cells
+NO_SPAN = 1 << 20
+
+
+
+def join_keys(
+    left: np.ndarray, right: np.ndarray,
+    keep: Optional[Callable[[np.ndarray, np.ndarray], np.ndarray]] = None, chunk: int = 2 ** 22
+) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    indices (li, ri) of all pairs with left[li] == right[ri]
+
+    sort-merge join: right is sorted once, every left key finds its run of equal right keys
+    with a binary search, and all pairs are gathered at once from the run starts and lengths
+    (pairs come out in the order of left, and in the order of right within a left key).
+    With keep only the pairs masked by keep(li, ri) are returned, the pairs are then gathered
+    for about chunk of them at a time
+    '''
+
+    order = np.argsort(right, kind='stable')
+    sorted_right = right[order]
+    lo = np.searchsorted(sorted_right, left, side='left')
+    counts = np.searchsorted(sorted_right, left, side='right') - lo
+
+    def gather(start: int, stop: int) -> Tuple[np.ndarray, np.ndarray]:
+        part = counts[start:stop]
+        li = np.repeat(np.arange(start, stop), part)
+        # offset of every pair inside its run: pair index minus the index of the run's first pair
+        firsts = np.cumsum(part) - part
+        ri = order[np.arange(li.size) + np.repeat(lo[start:stop] - firsts, part)]
+        return li, ri
+
+    if keep is None:
+        return gather(0, left.size)
+    ends = np.cumsum(counts)
+    cuts = np.searchsorted(ends, np.arange(chunk, int(ends[-1]) if left.size else 0, chunk), side='right')
+    kept = []
+    for start, stop in zip(np.concatenate(([0], cuts)), np.concatenate((cuts, [left.size]))):
+        li, ri = gather(int(start), int(stop))
+        mask = keep(li, ri)
+        kept.append((li[mask], ri[mask]))
+    return np.concatenate([li for li, _ in kept]), np.concatenate([ri for _, ri in kept])
 
 
 
 class SquareCell:
-    '''Represents a rectangular cell'''
+    '''
+    Represents a rectangular cell
+
+    all candidate patterns (height x width) are packed into an (n, height) np.uint64 array,
+    one integer per row, so the 2 wide rims used to join cells are integer keys as well
+    '''
 
 
-    def __init__(self, pats: Iterable[Life], pos: int) -> None:
+    def __init__(self, rows: np.ndarray, width: int, pos: int) -> None:
         '''
-        constructs a hash table => {left/top rim: corresponding pattern}
                                                3
         pos = position in its 2x2 square:    0   1
                                                2
         '''
 
-        self.hashs = {}
-        self.pats = pats
+        if width > 32 or rows.shape[1] > 32:
+            raise Exception('SquareCell patterns are limited to 32x32 cells.')
+        self.rows = rows
+        self.width = width
+        self.pos = pos
+
+
+    @staticmethod
+    def from_pats(pats: Iterable[Life], pos: int) -> SquareCell:
+        pats = list(pats)
+        return SquareCell(pack_rows(pats), pats[0].shape[1] if pats else 0, pos)
+
+
+    @staticmethod
+    def leaf(kind: str, pos: int) -> SquareCell:
+        '''cell with the single cell predecessors of a kind, e.g. 'ontl' (see single_cell_predecessors)'''
+
+        return SquareCell(packed_single_cell_predecessors(kind), 3, pos)
+
+
+    def to_bytes(self) -> bytes:
+        '''compact encoding for shipping between processes: a 4 x uint32 header and the rows as uint32'''
+
+        header = np.array([len(self), self.rows.shape[1], self.width, self.pos], dtype=np.uint32)
+        return header.tobytes() + self.rows.astype(np.uint32).tobytes()
+
+
+    @staticmethod
+    def from_bytes(data: bytes) -> SquareCell:
+        n, height, width, pos = map(int, np.frombuffer(data[:16], dtype=np.uint32))
+        rows = np.frombuffer(data[16:], dtype=np.uint32).astype(np.uint64).reshape(n, height)
+        return SquareCell(rows, width, pos)
+
+
+    def select(self, keep: np.ndarray) -> SquareCell:
+        '''cell with only the candidates selected by keep (boolean mask or indices)'''
+        return SquareCell(self.rows[keep], self.width, self.pos)
+
+
+    def transformed(self, symmetry: str, pos: int) -> SquareCell:
+        '''cell with every candidate mapped by one of SYMMETRIES (order of the candidates is kept)'''
+
+        bits = SYMMETRIES[symmetry](row_bits(self.rows, self.width))
+        return SquareCell(bits_rows(bits), bits.shape[2], pos)
+
+
+    @property
+    def pats(self) -> List[Life]:
+        return list(unpack_rows(self.rows, self.width))
+
+
+    def __len__(self) -> int:
+        return self.rows.shape[0]
+
+
+    def populations(self, mask: Optional[np.ndarray] = None) -> np.ndarray:
+        '''amount of alive cells of every candidate, only of the cells set in mask (packed like a candidate) if given'''
+
+        rows = np.ascontiguousarray(self.rows if mask is None else self.rows & mask)
+        return POPCOUNT[rows.view(np.uint8)].reshape(len(self), 8 * rows.shape[1]).sum(axis=1, dtype=np.int64)
+
+
+    def spans(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        '''
+        (top, down, left, right) first and last alive row and column of every candidate
+
+        for a candidate without alive cells top and left are NO_SPAN, down and right -NO_SPAN
+        '''
+
+        alive = self.rows != 0
+        any_alive = alive.any(axis=1)
+        height = self.rows.shape[1]
+        top = np.where(any_alive, alive.argmax(axis=1), NO_SPAN)
+        down = np.where(any_alive, height - 1 - alive[:, ::-1].argmax(axis=1), -NO_SPAN)
+        # all alive columns in one integer (at most 32 bits, exact as float)
+        cols = np.bitwise_or.reduce(self.rows, axis=1).astype(np.int64)
+        left = np.where(any_alive, np.log2(np.maximum(cols & -cols, 1)), NO_SPAN).astype(np.int64)
+        right = np.where(any_alive, np.floor(np.log2(np.maximum(cols, 1))), -NO_SPAN).astype(np.int64)
+        return top, down, left, right
+
+
+    @property
+    def left_keys(self) -> np.ndarray:
+        shifts = np.arange(0, 2 * self.rows.shape[1], 2, dtype=np.uint64)
+        return ((self.rows & np.uint64(3)) << shifts).sum(axis=1, dtype=np.uint64)
+
+    @property
+    def right_keys(self) -> np.ndarray:
+        shifts = np.arange(0, 2 * self.rows.shape[1], 2, dtype=np.uint64)
+        rim = (self.rows >> np.uint64(self.width - 2)) & np.uint64(3)
+        return (rim << shifts).sum(axis=1, dtype=np.uint64)
+
+    @property
+    def top_keys(self) -> np.ndarray:
+        return self.rows[:, 0] | (self.rows[:, 1] << np.uint64(self.width))
+
+    @property
+    def down_keys(self) -> np.ndarray:
+        return self.rows[:, -2] | (self.rows[:, -1] << np.uint64(self.width))
+
+    def area_keys(self, rows: slice, cols: slice) -> np.ndarray:
+        '''the cells of rows x cols (at most 64) of every candidate packed into one integer key'''
 
-        if pos == 1:
-            for p in pats:
-                h = left2(p).tostring()
-                if h in self.hashs:
-                    self.hashs[h].append(p)
-                else:
-                    self.hashs[h] = [p]
-        elif pos == 2:
-            for p in pats:
-                h = top2(p).tostring()
-                if h in self.hashs:
-                    self.hashs[h].append(p)
-                else:
-                    self.hashs[h] = [p]
+        width = cols.stop - cols.start
+        area = (self.rows[:, rows] >> np.uint64(cols.start)) & np.uint64((1 << width) - 1)
+        shifts = np.arange(0, width * area.shape[1], width, dtype=np.uint64)
+        return (area << shifts).sum(axis=1, dtype=np.uint64)
 
 
 
@@ -47,37 +221,213 @@ class SquareCell:
     ) -> SquareCell:
         '''
         takes 2 or 4 SquareCell objects and creates a new one out of all possible combinations
-        
+
         kinds:    'vertical':  c1      'horizontal':  c1 c2      'quad':  c1 c2
                                c2                                         c3 c4
         '''
 
         if kind == 'vertical':
-            tops, downs = c1.pats, c2
+            tops, downs = c1, c2
         else:
-            # tops
-            tops = []
-            for left_cell in c1.pats:
-                h = right2(left_cell).tostring()
-                if h in c2.hashs:
-                    for reight_cell in c2.hashs[h]:
-                        tops.append(merge_halves_horizontal(left_cell, reight_cell))
-            if kind == 'horizontal': return SquareCell(tops, pos)
-            
-            # downs
-            downs = []
-            for left_cell in c3.pats:
-                h = right2(left_cell).tostring()
-                if h in c4.hashs:
-                    for reight_cell in c4.hashs[h]:
-                        downs.append(merge_halves_horizontal(left_cell, reight_cell))
-            downs = SquareCell(downs, 2)
+            tops = SquareCell.merge_horizontal(c1, c2, pos)
+            if kind == 'horizontal': return tops
+            downs = SquareCell.merge_horizontal(c3, c4, 2)
 
         # quads or vertical
-        quads = []
-        for top_cell in tops:
-            h = down2(top_cell).tostring()
-            if h in downs.hashs:
-                for down_cell in downs.hashs[h]:
-                    quads.append(merge_halves_vertical(top_cell, down_cell))
-        return SquareCell(quads, pos)
\ No newline at end of file
+        return SquareCell.merge_vertical(tops, downs, pos)
+
+
+    @staticmethod
+    def merge_horizontal(
+        le: SquareCell, re: SquareCell, pos: int, ordered: bool = False,
+        keep: Optional[Callable[[np.ndarray, np.ndarray], np.ndarray]] = None
+    ) -> SquareCell:
+        '''
+        all combinations of le next to re that agree on their shared 2 columns
+
+        ordered = True only keeps the combinations of le[i] and re[j] with i <= j
+        (for a re that is the mirror image of le, see root_join in reverse_quad_gen),
+        keep(i, j) masks the combinations to build out of the index arrays i, j (see bounded_merge in reverse_quad_gen)
+        '''
+
+        li, ri = join_keys(le.right_keys, re.left_keys, keep)
+        if ordered:
+            li, ri = li[li <= ri], ri[li <= ri]
+        rows = le.rows[li] | (re.rows[ri] << np.uint64(le.width - 2))
+        return SquareCell(rows, le.width + re.width - 2, pos)
+
+
+    @staticmethod
+    def merge_vertical(
+        up: SquareCell, do: SquareCell, pos: int, ordered: bool = False,
+        keep: Optional[Callable[[np.ndarray, np.ndarray], np.ndarray]] = None
+    ) -> SquareCell:
+        '''all combinations of up above do that agree on their shared 2 rows (ordered and keep as in merge_horizontal)'''
+
+        ui, di = join_keys(up.down_keys, do.top_keys, keep)
+        if ordered:
+            ui, di = ui[ui <= di], di[ui <= di]
+        rows = np.concatenate((up.rows[ui, :-1], do.rows[di, 1:]), axis=1)
+        return SquareCell(rows, up.width, pos)
+
+
+
+class CountCell(SquareCell):
+    '''
+    Represents a rectangular cell by the 2 wide rims of its candidates and their multiplicities
+
+    joins only ever compare rims, so the inside of a candidate does not matter for counting:
+    every distinct rim (the packed rows with the rest cleared) is kept once as a candidate,
+    counts[i] is the amount of candidates with rim i as python int (object array, never overflows).
+    Only the sides that will still be joined are kept (sides = e.g. 'tdlr', top down left right)
+    '''
+
+
+    def __init__(self, rows: np.ndarray, width: int, pos: int, counts: np.ndarray) -> None:
+        super().__init__(rows, width, pos)
+        self.counts = counts
+
+
+    @staticmethod
+    def leaf(kind: str, pos: int, sides: str = 'tdlr') -> CountCell:
+        rows = packed_single_cell_predecessors(kind)
+        return CountCell.reduced(rows, 3, pos, np.ones(len(rows), dtype=object), sides)
+
+
+    def select(self, keep: np.ndarray) -> CountCell:
+        return CountCell(self.rows[keep], self.width, self.pos, self.counts[keep])
+
+
+    @staticmethod
+    def reduced(rows: np.ndarray, width: int, pos: int, counts: np.ndarray, sides: str) -> CountCell:
+        '''cell of the rims (on sides) of rows, the counts of candidates with equal rims are added up'''
+
+        height = rows.shape[1]
+        full = (1 << width) - 1
+        rim = (3 if 'l' in sides else 0) | ((3 << (width - 2)) if 'r' in sides else 0)
+        mask = np.array([
+            full if (r < 2 and 't' in sides) or (r >= height - 2 and 'd' in sides) else rim
+            for r in range(height)
+        ], dtype=np.uint64)
+        rims, inverse = np.unique(rows & mask, axis=0, return_inverse=True)
+        merged = np.zeros(len(rims), dtype=object)
+        np.add.at(merged, inverse.reshape(-1), counts)
+        return CountCell(rims.reshape(-1, height), width, pos, merged)
+
+
+    @property
+    def total(self) -> int:
+        '''amount of candidates'''
+        return int(self.counts.sum())
+
+
+    @staticmethod
+    def merge(
+        pos: int, kind: str,
+        c1: CountCell,                  c2: CountCell,
+        c3: Optional[CountCell] = None, c4: Optional[CountCell] = None,
+        sides: str = 'tdlr'
+    ) -> CountCell:
+        '''SquareCell.merge on rims, multiplying the counts of every joined pair'''
+
+        if kind == 'vertical':
+            tops, downs = c1, c2
+        else:
+            tops = CountCell.merge_horizontal(c1, c2, pos, sides if kind == 'horizontal' else sides.replace('d', '') + 'd')
+            if kind == 'horizontal': return tops
+            downs = CountCell.merge_horizontal(c3, c4, 2, sides.replace('t', '') + 't')
+
+        # quads or vertical
+        return CountCell.merge_vertical(tops, downs, pos, sides)
+
+
+    @staticmethod
+    def merge_horizontal(le: CountCell, re: CountCell, pos: int, sides: str = 'tdlr') -> CountCell:
+        li, ri = join_keys(le.right_keys, re.left_keys)
+        rows = le.rows[li] | (re.rows[ri] << np.uint64(le.width - 2))
+        return CountCell.reduced(rows, le.width + re.width - 2, pos, le.counts[li] * re.counts[ri], sides)
+
+
+    @staticmethod
+    def merge_vertical(up: CountCell, do: CountCell, pos: int, sides: str = 'tdlr') -> CountCell:
+        ui, di = join_keys(up.down_keys, do.top_keys)
+        rows = np.concatenate((up.rows[ui, :-1], do.rows[di, 1:]), axis=1)
+        return CountCell.reduced(rows, up.width, pos, up.counts[ui] * do.counts[di], sides)
+
+
+
+def arc_consistency(cells: List[SquareCell], cords: List[Tuple[int, int]]) -> int:
+    '''
+    drop every candidate that agrees with no candidate of some overlapping cell, until nothing changes
+
+    cells[i] holds the predecessors of the goal rectangle starting at cords[i], so its patterns start at
+    cords[i] in the coordinates of the padded goal; cells of neighbouring rectangles overlap in a 2 wide
+    strip (or a 2x2 corner). The cells are replaced in place, returns the amount of dropped candidates
+    '''
+
+    overlaps: List[List[Tuple[int, Tuple[slice, slice], Tuple[slice, slice]]]] = [[] for _ in cells]
+    for i, j in combinations(range(len(cells)), 2):
+        (ri, ci), (rj, cj) = cords[i], cords[j]
+        r0 = max(ri, rj)
+        r1 = min(ri + cells[i].rows.shape[1], rj + cells[j].rows.shape[1])
+        c0 = max(ci, cj)
+        c1 = min(ci + cells[i].width, cj + cells[j].width)
+        if r0 < r1 and c0 < c1:
+            area_i = (slice(r0 - ri, r1 - ri), slice(c0 - ci, c1 - ci))
+            area_j = (slice(r0 - rj, r1 - rj), slice(c0 - cj, c1 - cj))
+            overlaps[i].append((j, area_i, area_j))
+            overlaps[j].append((i, area_j, area_i))
+
+    # keys per (cell, area), forgotten when the cell changes
+    cache: Dict[Tuple[int, Tuple[int, ...]], np.ndarray] = {}
+    def keys(i: int, area: Tuple[slice, slice]) -> np.ndarray:
+        key = (i, (area[0].start, area[0].stop, area[1].start, area[1].stop))
+        if key not in cache:
+            cache[key] = cells[i].area_keys(*area)
+        return cache[key]
+
+    # a cell without candidates leaves no predecessor at all, then all cells are emptied at once
+    def emptied() -> int:
+        amount = sum(len(cell) for cell in cells)
+        cells[:] = [cell.select(np.zeros(len(cell), dtype=bool)) for cell in cells]
+        return amount
+
+    # revise the neighbours of every changed cell (at first of all cells)
+    pruned = 0
+    if any(len(cell) == 0 for cell in cells):
+        return emptied()
+    queue = deque(range(len(cells)))
+    queued = set(queue)
+    while queue:
+        j = queue.popleft()
+        queued.discard(j)
+        for i, area_j, area_i in overlaps[j]:
+            bits = (area_i[0].stop - area_i[0].start) * (area_i[1].stop - area_i[1].start)
+            if bits <= 16:
+                # small areas (all of them between leaves) are looked up in a table of present keys
+                present = np.zeros(1 << bits, dtype=bool)
+                present[keys(j, area_j)] = True
+                keep = present[keys(i, area_i)]
+            else:
+                keep = np.isin(keys(i, area_i), keys(j, area_j))
+            if not keep.all():
+                pruned += len(keep) - int(keep.sum())
+                cells[i] = cells[i].select(keep)
+                if len(cells[i]) == 0:
+                    return pruned + emptied()
+                for key in [key for key in cache if key[0] == i]:
+                    del cache[key]
+                if i not in queued:
+                    queue.append(i)
+                    queued.add(i)
+    return pruned
+
+
+
+@lru_cache(maxsize=None)
+def packed_single_cell_predecessors(kind: str) -> np.ndarray:
+    '''single_cell_predecessors()[kind] packed by pack_rows, computed once per kind'''
+
+    rows = pack_rows(single_cell_predecessors()[kind])
+    rows.flags.writeable = False
+    return rows
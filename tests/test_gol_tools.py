@@ -0,0 +1,130 @@
+import numpy as np
+import pytest
+
+import gol_tools as gol
+import hashlife
+
+Life = np.ndarray
+
+
+SHAPES = [(1, 1), (1, 7), (7, 1), (2, 2), (5, 8), (16, 16), (9, 33)]
+GEOMETRIES = ['Hard Edges', 'Torus']
+ENGINES = ['Dense', 'Bit-Packed', 'HashLife', 'Active']
+GLIDER = np.array([[0, 1, 0], [0, 0, 1], [1, 1, 1]], dtype=np.int8)
+
+
+
+def reference_next_gen(life: Life, geometry: str) -> Life:
+    '''the per cell loop next_gen replaced, neighbours outside a 'Hard Edges' board are dead'''
+
+    rows, cols = life.shape
+    new_life = np.zeros(life.shape, dtype=np.int8)
+    for r in range(rows):
+        for c in range(cols):
+            near = 0
+            for dr in (-1, 0, 1):
+                for dc in (-1, 0, 1):
+                    if dr == dc == 0:
+                        continue
+                    nr, nc = r + dr, c + dc
+                    if geometry == 'Torus':
+                        near += life[nr % rows, nc % cols]
+                    elif 0 <= nr < rows and 0 <= nc < cols:
+                        near += life[nr, nc]
+            if near == 3 or (near == 2 and life[r, c]):
+                new_life[r, c] = 1
+    return new_life
+
+
+def random_life(shape, seed: int) -> Life:
+    return (np.random.default_rng(seed).random(shape) < 0.4).astype(np.int8)
+
+
+
+@pytest.mark.parametrize('geometry', GEOMETRIES)
+@pytest.mark.parametrize('shape', SHAPES)
+def test_next_gen_matches_loop(shape, geometry):
+    for seed in range(5):
+        life = random_life(shape, seed)
+        assert np.array_equal(gol.next_gen(life, geometry), reference_next_gen(life, geometry))
+
+
+@pytest.mark.parametrize('geometry', GEOMETRIES)
+def test_next_gen_full_board(geometry):
+    for shape in SHAPES:
+        life = np.ones(shape, dtype=np.int8)
+        assert np.array_equal(gol.next_gen(life, geometry), reference_next_gen(life, geometry))
+
+
+@pytest.mark.parametrize('geometry', GEOMETRIES)
+def test_next_gen_stack(geometry):
+    lifes = np.array([random_life((6, 9), seed) for seed in range(4)])
+    expected = [reference_next_gen(life, geometry) for life in lifes]
+    assert np.array_equal(gol.next_gen(lifes, geometry), expected)
+
+
+@pytest.mark.parametrize('geometry, engine', [
+    (geometry, engine) for geometry in GEOMETRIES for engine in ENGINES if engine != 'HashLife' or geometry == 'Torus'
+])
+@pytest.mark.parametrize('shape', SHAPES)
+def test_run_gens_matches_loop(shape, geometry, engine):
+    life = random_life(shape, 7)
+    expected = life
+    for _ in range(6):
+        expected = reference_next_gen(expected, geometry)
+    assert np.array_equal(gol.run_gens(life, 6, geometry=geometry, engine=engine), expected)
+
+
+def test_hashlife_torus_flushing_nodes():
+    # a table this small is flushed during the leaps
+    engine = hashlife.HashLife(max_nodes=4096)
+    life = random_life((11, 13), 3)
+    expected = life
+    for _ in range(37):
+        expected = reference_next_gen(expected, 'Torus')
+    assert np.array_equal(engine.run_torus(life, 37), expected)
+
+
+def test_run_gens_hashlife_hard_edges():
+    with pytest.raises(Exception):
+        gol.run_gens(random_life((4, 4), 0), 1, geometry='Hard Edges', engine='HashLife')
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+@pytest.mark.parametrize('shape', [(1, 1), (3, 5), (8, 8)])
+def test_run_gens_unbounded_matches_padded(shape, engine):
+    # nothing gets further than one cell per generation, so a board padded by gens + 1 is never reached at its edges
+    gens = 12
+    for seed in range(3):
+        life = random_life(shape, seed)
+        expected = gol.run_gens(np.pad(life, gens + 1), gens)
+        origins = []
+        found = gol.run_gens(life, gens, geometry='Unbounded', engine=engine, origins=origins)
+        placed = np.zeros_like(expected)
+        if found.any():
+            row, col = origins[0][0] + gens + 1, origins[0][1] + gens + 1
+            placed[row : row + found.shape[0], col : col + found.shape[1]] = found
+        assert np.array_equal(placed, expected)
+
+
+def test_next_gen_unknown_geometry():
+    with pytest.raises(Exception):
+        gol.next_gen(np.zeros((3, 3), dtype=np.int8), 'Klein Bottle')
+
+
+@pytest.mark.parametrize('engine, gens', [('Dense', 64), ('HashLife', 2 ** 16)])
+def test_run_gens_unbounded_keeps_bounding_box(engine, gens):
+    origins = []
+    life = gol.run_gens(np.pad(GLIDER, 2), gens, geometry='Unbounded', engine=engine, origins=origins)
+    assert np.array_equal(life, GLIDER)
+    assert origins == [(2 + gens // 4, 2 + gens // 4)]
+
+
+@pytest.mark.parametrize('engine', ['Dense', 'HashLife'])
+def test_run_gens_unbounded_max_side(engine):
+    blinker = np.zeros((5, 5), dtype=np.int8)
+    blinker[2, 1:4] = 1
+    assert gol.run_gens(blinker, 4, geometry='Unbounded', engine=engine, max_side=3).shape == (1, 3)
+    # a full 3x3 block grows to 5x5 in one generation
+    with pytest.raises(Exception):
+        gol.run_gens(np.ones((3, 3), dtype=np.int8), 1, geometry='Unbounded', engine=engine, max_side=3)
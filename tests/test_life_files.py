@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from life_files import coord_lines, coords_from_life106, coords_to_life106, from_life106, to_life106
+
+Life = np.ndarray
+
+
+MALFORMED = ['1 2 3', '1', '1 x']
+
+
+
+def test_life106_round_trip():
+    for seed in range(5):
+        life = (np.random.default_rng(seed).random((13, 21)) < 0.3).astype(np.int8)
+        life[0, 0] = life[-1, -1] = 1
+        assert np.array_equal(from_life106(to_life106(life)), life)
+
+
+def test_coords_round_trip_negative_and_multi_digit():
+    coords = np.array([
+        [0, 0], [-1, 0], [0, -1], [9, -10], [-99, 100], [123456, -7], [-2 ** 40, 2 ** 40], [10, 1000000]
+    ], dtype=np.int64)
+    assert np.array_equal(coords_from_life106(coords_to_life106(coords)), coords)
+
+
+def test_coord_lines():
+    assert coord_lines(np.array([[0, -5], [-12, 300]])) == '0 -5\n-12 300\n'
+    assert coord_lines(np.zeros((0, 2), dtype=np.int64)) == ''
+
+
+def test_empty_file():
+    assert coords_from_life106('#Life 1.06\n').shape == (0, 2)
+    assert coords_from_life106('#Life 1.06').shape == (0, 2)
+    assert np.array_equal(from_life106('#Life 1.06\n'), np.zeros((1, 1), dtype=np.int8))
+    assert np.array_equal(from_life106(to_life106(np.zeros((3, 4), dtype=np.int8))), np.zeros((1, 1), dtype=np.int8))
+
+
+def test_comment_lines():
+    coords = coords_from_life106('#Life 1.06\n#D a glider\n0 1\n#N\n1 2\n2 0\n2 1\n2 2\n')
+    assert np.array_equal(coords, [[0, 1], [1, 2], [2, 0], [2, 1], [2, 2]])
+
+
+@pytest.mark.parametrize('before', ['', '0 0\n'])
+@pytest.mark.parametrize('line', MALFORMED)
+def test_malformed_lines(line, before):
+    with pytest.raises(Exception):
+        coords_from_life106(f'#Life 1.06\n{before}{line}\n')
+
+
+def test_missing_header():
+    with pytest.raises(Exception):
+        coords_from_life106('0 0\n1 1\n')
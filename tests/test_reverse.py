@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from reverse_quad_gen import quad_count, quad_gen
+from reverse_rows import row_gen
+from reverse_sat import sat_gen
+
+Life = np.ndarray
+
+
+# 4x4 goals the quadtree used to find too few predecessors of (e.g. 199 of 212 for the last one)
+GOALS = [
+    [[0, 0, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1], [0, 1, 0, 0]],
+    [[0, 1, 0, 0], [1, 0, 0, 0], [0, 0, 0, 1], [0, 0, 0, 0]],
+    [[1, 0, 0, 0], [0, 0, 0, 0], [1, 0, 0, 1], [0, 1, 0, 0]],
+]
+
+
+
+def as_set(lifes) -> set:
+    return {np.asarray(life, dtype=np.int8).tobytes() for life in lifes}
+
+
+
+@pytest.mark.parametrize('goal', GOALS)
+def test_quad_gen_matches_sat_and_rows(goal):
+    goal = np.array(goal, dtype=np.int8)
+    found = as_set(quad_gen(goal))
+    assert found == as_set(sat_gen(goal, None))
+    assert found == as_set(row_gen(goal))
+    assert len(found) == quad_count(goal)
+
+
+def test_quad_count_rejects_large_goals():
+    with pytest.raises(Exception):
+        quad_count(np.zeros((31, 4), dtype=np.int8))
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+import time
+
+import gol_tools as gol
+from reverse_cache import PredecessorCache
+from reverse_rows import row_gen
+
+Life = np.ndarray
+
+
+# not symmetric, so every mirror image of it is a different goal
+GOAL = np.array([[1, 0, 0, 0], [0, 0, 0, 0], [1, 0, 0, 1]], dtype=np.int8)
+
+
+
+def as_set(lifes) -> set:
+    return {(life.shape, np.asarray(life, dtype=np.int8).tobytes()) for life in lifes}
+
+
+@pytest.fixture
+def cache(tmp_path) -> PredecessorCache:
+    return PredecessorCache(str(tmp_path / 'cache.sqlite'))
+
+
+
+def test_put_get_round_trip(cache):
+    lifes = row_gen(GOAL)
+    assert cache.get(GOAL) is None
+    cache.put(GOAL, lifes)
+    assert as_set(cache.get(GOAL)) == as_set(lifes)
+    assert cache.get(GOAL, 'Torus') is None
+
+
+def test_empty_set(cache):
+    cache.put(GOAL, [])
+    assert cache.get(GOAL) == []
+
+
+@pytest.mark.parametrize('name', list(gol.SYMMETRIES))
+def test_mirrored_goals_share_the_entry(cache, name):
+    lifes = row_gen(GOAL)
+    cache.put(GOAL, lifes)
+    sym = gol.SYMMETRIES[name]
+    image = np.ascontiguousarray(sym(GOAL))
+    found = cache.get(image)
+    assert as_set(found) == as_set(np.ascontiguousarray(sym(life)) for life in lifes)
+    assert gol.test_if_pre(found, image) == 0
+
+
+def test_lru_eviction(tmp_path):
+    rng = np.random.default_rng(0)
+    goals = [np.zeros((2, 6 + k), dtype=np.int8) for k in range(3)]
+    # incompressible sets of 8 to 10 KB each, room for two of them
+    sets = [list((rng.random((2 ** 11, 4, 8 + k)) < 0.5).astype(np.int8)) for k in range(3)]
+    cache = PredecessorCache(str(tmp_path / 'cache.sqlite'), max_bytes=2 ** 14 + 2 ** 12)
+    cache.put(goals[0], sets[0])
+    time.sleep(0.01)
+    cache.put(goals[1], sets[1])
+    time.sleep(0.01)
+    # the first one was used last, so the second one is evicted
+    assert cache.get(goals[0]) is not None
+    time.sleep(0.01)
+    cache.put(goals[2], sets[2])
+    assert cache.get(goals[0]) is not None
+    assert cache.get(goals[1]) is None
+    assert cache.get(goals[2]) is not None
+
+
+def test_storing_only_exhausted_streams(cache):
+    lifes = row_gen(GOAL)
+    stream = cache.storing(GOAL, iter(lifes))
+    next(stream)
+    assert cache.get(GOAL) is None
+    assert len(list(stream)) == len(lifes) - 1
+    assert as_set(cache.get(GOAL)) == as_set(lifes)
+
+
+def test_storing_too_many(tmp_path):
+    lifes = row_gen(GOAL)
+    cache = PredecessorCache(str(tmp_path / 'cache.sqlite'), max_lifes=len(lifes) - 1)
+    assert len(list(cache.storing(GOAL, iter(lifes)))) == len(lifes)
+    assert cache.get(GOAL) is None